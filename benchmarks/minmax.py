@@ -0,0 +1,40 @@
+"""time Series.minmax() on synthetic census-like columns
+
+    python benchmarks/minmax.py [rows]
+"""
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from dfeqa.datastructures import Series
+
+
+def columns(n):
+    rng = np.random.default_rng(0)
+    names = np.array(["Name%d" % i for i in range(20000)] + ["Zoë", "O'Neil", "Émile"], dtype=object)
+    forename = pd.Series(names[rng.integers(0, names.size, n)], dtype=object)
+    forename[rng.random(n) < 0.05] = None
+    ncyear = pd.Series(np.array(['R', '1', '2', '3', '4', '5', '6', 'X'], dtype=object)[rng.integers(0, 8, n)])
+    number_text = pd.Series(rng.integers(0, 100000, n).astype(str), dtype=object)
+    number_text[rng.random(n) < 0.01] = "unknown"
+    date_text = pd.Series(pd.Timestamp('2010-01-01') + pd.to_timedelta(rng.integers(0, 5000, n), unit='D'))\
+        .dt.strftime('%Y-%m-%d').astype(object)
+    return {
+        'forename (text)': (forename, {}),
+        'ncyear (few values)': (ncyear, {}),
+        'numbers as text': (number_text, {}),
+        'dates as text': (date_text, {'stype': 'date', 'format': '%Y-%m-%d'}),
+        'integers': (pd.Series(rng.integers(0, 1000, n)), {}),
+        }
+
+def main(n):
+    for name, (values, kwargs) in columns(n).items():
+        s = Series(values)
+        start = time.perf_counter()
+        s.minmax(**kwargs)
+        print("%-22s %8.3fs" % (name, time.perf_counter() - start))
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000)
@@ -1,9 +1,50 @@
 from dfeqa.__about__ import __version__
 from dfeqa.data_transformation import year_group
-from dfeqa.data_validation import relaxed_valid_name_regex, valid_name_regex, valid_upn
-from dfeqa.db import get_default_conn, get_table, get_table_metadata, list_tables, list_views, load_census, query
-from dfeqa.summaries import barchart, fd, freqchart, parse_text, status_summary, summary
+from dfeqa.data_validation import (
+    char_counts,
+    char_inventory,
+    relaxed_valid_name_regex,
+    unicode_blocks,
+    valid_name_regex,
+    valid_upn,
+)
+from dfeqa.db import (
+    clear_cache,
+    configure_budget,
+    configure_cache,
+    configure_env,
+    configure_pool,
+    configure_stats,
+    engine_stats,
+    get_default_conn,
+    get_table,
+    get_table_async,
+    get_table_incremental,
+    get_table_iter,
+    get_table_metadata,
+    invalidate_metadata,
+    list_tables,
+    list_views,
+    load_census,
+    match_keys,
+    minmax_sql,
+    query,
+    query_async,
+    query_iter,
+    query_many,
+    reflect_schema,
+    reload_env,
+    stats,
+    write_table,
+)
+from dfeqa.summaries import barchart, fd, fd_sql, freqchart, parse_text, status_summary, summary
 
-__all__ = ["__version__","year_group", "relaxed_valid_name_regex","valid_name_regex", "valid_upn","get_default_conn",
+__all__ = ["__version__","year_group", "relaxed_valid_name_regex","valid_name_regex", "valid_upn",
+            "char_inventory", "char_counts", "unicode_blocks", "get_default_conn",
             "get_table_metadata","load_census","barchart", "fd", "freqchart", "parse_text", "status_summary",
-            "summary","get_table", "query", "list_tables", "list_views"]
+            "summary","get_table", "query", "list_tables", "list_views", "configure_pool", "engine_stats",
+            "query_iter", "get_table_iter", "configure_cache", "clear_cache",
+            "query_many", "query_async", "get_table_async", "get_table_incremental",
+            "reflect_schema", "invalidate_metadata", "configure_env", "reload_env", "configure_stats", "stats",
+            "configure_budget", "write_table", "match_keys",
+            "fd_sql", "minmax_sql"]
@@ -0,0 +1,137 @@
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+import warnings
+from enum import Enum
+from pathlib import Path
+
+import pandas as pd
+
+from dfeqa.datastructures import DataFrame
+
+
+class Constants(Enum):
+    DATA_SUFFIX = '.parquet'
+    META_SUFFIX = '.json'
+
+
+def make_key(sql, conn, params=None):
+    """hash of the whitespace-normalised sql text, the resolved connection and any parameters"""
+    normalised = re.sub(r"\s+", " ", str(sql)).strip()
+    return hashlib.sha256(json.dumps([normalised, str(conn), params], sort_keys=True, default=str)
+        .encode('utf-8')).hexdigest()
+
+
+class query_cache():
+    """on-disk store of query results as parquet files
+        directory: where the cached results are kept
+        ttl: seconds an entry stays valid unless given its own ttl
+        max_bytes: total size of the cache, beyond which the least recently used entries are removed"""
+    _lock = threading.RLock()
+
+    def __init__(self, directory, ttl, max_bytes):
+        self._directory = Path(directory)
+        self._ttl = ttl
+        self._max_bytes = max_bytes
+
+    @property
+    def directory(self):
+        return self._directory
+
+    def _paths(self, key):
+        return (self._directory / (key + Constants.DATA_SUFFIX.value),
+            self._directory / (key + Constants.META_SUFFIX.value))
+
+    def _read_meta(self, meta_path):
+        try:
+            with open(meta_path, encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _expired(self, meta):
+        return meta is None or (meta['ttl'] is not None and time.time() > meta['created'] + meta['ttl'])
+
+    def _remove(self, key):
+        for path in self._paths(key):
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+
+    def get(self, key, dtype_backend=None):
+        """(returns): the cached dataframe for key, or None if it is missing or expired
+            dtype_backend: 'pyarrow' to read the result into arrow-backed columns"""
+        data_path, meta_path = self._paths(key)
+        with self._lock:
+            if not data_path.exists():
+                return None
+            if self._expired(self._read_meta(meta_path)):
+                self._remove(key)
+                return None
+            # the data file's modification time records when it was last used
+            os.utime(data_path)
+        try:
+            return DataFrame(pd.read_parquet(data_path) if dtype_backend is None else
+                pd.read_parquet(data_path, dtype_backend=dtype_backend))
+        except (OSError, ValueError):
+            self._remove(key)
+            return None
+
+    def put(self, key, df, sql=None, ttl=None):
+        """store df under key then evict entries until the cache fits in max_bytes
+        (returns): True if df was stored"""
+        self._directory.mkdir(parents=True, exist_ok=True)
+        data_path, meta_path = self._paths(key)
+        tmp_path = data_path.with_name("%s.%d.%d.tmp" % (key, os.getpid(), threading.get_ident()))
+        try:
+            df.to_parquet(tmp_path)
+        except (TypeError, ValueError) as e:
+            # mixed-type object columns can't always be written to parquet
+            warnings.warn("result not cached: %s" % e, RuntimeWarning, stacklevel=3)
+            tmp_path.unlink(missing_ok=True)
+            return False
+        with self._lock:
+            os.replace(tmp_path, data_path)
+            with open(meta_path, 'w', encoding='utf-8') as f:
+                json.dump({'sql': None if sql is None else str(sql), 'created': time.time(),
+                    'ttl': self._ttl if ttl is None else ttl}, f)
+            self.evict()
+        return True
+
+    def entries(self):
+        """(returns): list of (key, bytes, last used) for the cached results, least recently used first"""
+        if not self._directory.exists():
+            return []
+        found = []
+        for path in self._directory.glob('*' + Constants.DATA_SUFFIX.value):
+            try:
+                st = path.stat()
+            except FileNotFoundError:
+                continue
+            found.append((path.name[:-len(Constants.DATA_SUFFIX.value)], st.st_size, st.st_mtime))
+        return sorted(found, key=lambda x: x[2])
+
+    def evict(self):
+        """remove expired entries, then the least recently used until the total size is within max_bytes"""
+        with self._lock:
+            remaining = []
+            for key, size, used in self.entries():
+                if self._expired(self._read_meta(self._paths(key)[1])):
+                    self._remove(key)
+                else:
+                    remaining.append((key, size, used))
+            total = sum(size for _k, size, _u in remaining)
+            for key, size, _u in remaining:
+                if self._max_bytes is None or total <= self._max_bytes:
+                    break
+                self._remove(key)
+                total -= size
+
+    def clear(self):
+        with self._lock:
+            for key, _s, _u in self.entries():
+                self._remove(key)
@@ -1,3 +1,6 @@
+import numpy as np
+import pandas as pd
+
 valid_name_regex = (r"^[\d\-.,\'’\"\+\*\(\)\[\]\ `_\/\\A-Za-zÀ-ÖØ-öø-ÿĀ-ſƀ-ȳɐ-ʭ]*"
     r"[A-Za-zÀ-ÖØ-öø-ÿĀ-ſƀ-ȳɐ-ʭ]+[\d\-.,\'’\"\+\*"
     r"\(\)\[\]\ `_\/\\A-Za-zÀ-ÖØ-öø-ÿĀ-ſƀ-ȳɐ-ʭ]*$")
@@ -28,3 +31,104 @@ def valid_upn(UPNstring: str):
     if check_letter != UPNstring[0]:
         return False
     return True
+
+unicode_block_ranges = (
+    (0x0000, 0x007F, 'Basic Latin'),
+    (0x0080, 0x00FF, 'Latin-1 Supplement'),
+    (0x0100, 0x017F, 'Latin Extended-A'),
+    (0x0180, 0x024F, 'Latin Extended-B'),
+    (0x0250, 0x02AF, 'IPA Extensions'),
+    (0x02B0, 0x02FF, 'Spacing Modifier Letters'),
+    (0x0300, 0x036F, 'Combining Diacritical Marks'),
+    (0x0370, 0x03FF, 'Greek and Coptic'),
+    (0x0400, 0x052F, 'Cyrillic'),
+    (0x0530, 0x058F, 'Armenian'),
+    (0x0590, 0x05FF, 'Hebrew'),
+    (0x0600, 0x06FF, 'Arabic'),
+    (0x0900, 0x097F, 'Devanagari'),
+    (0x0980, 0x09FF, 'Bengali'),
+    (0x0A00, 0x0A7F, 'Gurmukhi'),
+    (0x0A80, 0x0AFF, 'Gujarati'),
+    (0x0B80, 0x0BFF, 'Tamil'),
+    (0x0E00, 0x0E7F, 'Thai'),
+    (0x1E00, 0x1EFF, 'Latin Extended Additional'),
+    (0x2000, 0x206F, 'General Punctuation'),
+    (0x20A0, 0x20CF, 'Currency Symbols'),
+    (0x2100, 0x214F, 'Letterlike Symbols'),
+    (0x2190, 0x21FF, 'Arrows'),
+    (0x2200, 0x22FF, 'Mathematical Operators'),
+    (0x2500, 0x257F, 'Box Drawing'),
+    (0x25A0, 0x25FF, 'Geometric Shapes'),
+    (0x2600, 0x26FF, 'Miscellaneous Symbols'),
+    (0x3000, 0x303F, 'CJK Symbols and Punctuation'),
+    (0x3040, 0x30FF, 'Hiragana and Katakana'),
+    (0x4E00, 0x9FFF, 'CJK Unified Ideographs'),
+    (0xAC00, 0xD7AF, 'Hangul Syllables'),
+    (0xD800, 0xDFFF, 'Surrogates'),
+    (0xE000, 0xF8FF, 'Private Use Area'),
+    (0xFB00, 0xFB4F, 'Alphabetic Presentation Forms'),
+    (0xFE00, 0xFE0F, 'Variation Selectors'),
+    (0xFF00, 0xFFEF, 'Halfwidth and Fullwidth Forms'),
+    (0xFFF0, 0xFFFF, 'Specials'),
+    (0x1F300, 0x1FAFF, 'Emoji and Pictographs'),
+    )
+"""(first, last, name) of the unicode blocks most likely to turn up in names and addresses -
+other characters are counted as 'Other'"""
+
+def _code_points(values):
+    """code points of all the (non-null) strings in values end to end, and the number in each string"""
+    strings = [x for x in values if isinstance(x, str)]
+    code_points = np.frombuffer("".join(strings).encode('utf-32-le', errors='surrogatepass'), dtype=np.uint32)
+    return code_points, np.fromiter(map(len, strings), dtype=np.int64, count=len(strings))
+
+def _first_appearance(code_points, present):
+    """the present code points in the order they first appear in code_points - most characters turn up
+    near the start, so only a first chunk is searched in full, then just the positions of the rest"""
+    size = 1 << 16
+    chars, index = np.unique(code_points[:size], return_index=True)
+    missing = np.setdiff1d(present, chars, assume_unique=True)
+    if missing.size:
+        lookup = np.zeros(present[-1] + 1, dtype=bool)
+        lookup[missing] = True
+        positions = size + np.flatnonzero(lookup[code_points[size:]])
+        later, later_index = np.unique(code_points[positions], return_index=True)
+        chars, index = np.concatenate([chars, later]), np.concatenate([index, positions[later_index]])
+    return chars[np.argsort(index)].astype(np.int64)
+
+def char_inventory(values):
+    """characters used in values in the order they first appear, eg. to spot unexpected characters in names
+        values: strings (nulls are skipped) - the unique values of a column give the same answer faster"""
+    code_points, _lengths = _code_points(values)
+    if code_points.size == 0:
+        return ""
+    return "".join(map(chr, _first_appearance(code_points, np.flatnonzero(np.bincount(code_points)))))
+
+def char_counts(values, weights=None):
+    """how often each character appears in values
+        values: strings (nulls are skipped), eg. the unique values of a column
+        weights: (optional) number of rows with each value, to count characters in every row
+        (returns): series of counts indexed by character, in the order the characters first appear"""
+    values = list(values)
+    code_points, lengths = _code_points(values)
+    if weights is not None:
+        weights = np.asarray(weights, dtype=np.int64)[[isinstance(x, str) for x in values]]
+    counts = np.bincount(code_points) if weights is None else \
+        np.bincount(code_points, weights=np.repeat(weights, lengths)).astype(np.int64)
+    chars = _first_appearance(code_points, np.flatnonzero(counts))
+    return pd.Series(counts[chars], index=pd.Index([chr(x) for x in chars], dtype=object), name='count')
+
+def unicode_blocks(values, weights=None):
+    """how many characters in values come from each unicode block (see unicode_block_ranges),
+    eg. to find names written in more than one script
+        values: strings (nulls are skipped), eg. the unique values of a column
+        weights: (optional) number of rows with each value, to count characters in every row
+        (returns): series of counts indexed by block name, largest first"""
+    counts = char_counts(values, weights)
+    code_points = np.fromiter(map(ord, counts.index), dtype=np.int64, count=counts.size)
+    starts = np.array([x[0] for x in unicode_block_ranges])
+    ends = np.array([x[1] for x in unicode_block_ranges])
+    i = np.searchsorted(starts, code_points, side='right') - 1
+    known = (i >= 0) & (code_points <= ends[np.maximum(i, 0)])
+    names = np.where(known, np.array([x[2] for x in unicode_block_ranges], dtype=object)[np.maximum(i, 0)], 'Other')
+    return counts.groupby(names, sort=False).sum().sort_values(ascending=False, kind='stable')\
+        .rename_axis(None).rename('count')
@@ -1,13 +1,21 @@
+import copy
 import warnings
-from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import date
 from enum import Enum
+from functools import cached_property
 from inspect import getfullargspec
+from multiprocessing import shared_memory
+from statistics import NormalDist
 
+import numpy as np
 import pandas as pd
 from pandas.api.types import is_datetime64_any_dtype as is_datetime_64
 from pandas.api.types import is_timedelta64_dtype as is_timedelta_64
 from pandas.tseries.api import guess_datetime_format
 
+from dfeqa.data_validation import char_inventory
+
 
 class Constants(Enum):
     USER_SNUM = "numeric"
@@ -27,6 +35,227 @@ class Constants(Enum):
     PROP_NUMBERS_THRESH = 0.5
     FACTOR_THRESH = 25
     UNIQUE_RANGE = 500 # size of range at start of data to summarise unique values
+    CATEGORY_RATIO = 0.5 # text with fewer unique values per non-null value than this is stored as a category
+    INT_DTYPES = ('Int8', 'Int16', 'Int32', 'Int64')
+    CONFIDENCE = 0.95 # confidence level of the intervals given for counts estimated from a sample
+    NULL_TEXT = ("NaT", "nat", "NAT", "nan", "NaN", "NAN", "now", "today") # text pandas skips when inferring dates
+    SHARED_KIND = "biufcmM" # numpy dtype kinds handed to worker processes through shared memory
+    N_UNIQUE = ("exact", "approx") # how minmax counts distinct values
+    HLL_PRECISION = 14 # 2**14 registers for approximate distinct counts, a relative standard error of 0.8%
+    HLL_BLOCK = 1 << 18 # values hashed at a time, so the memory used doesn't grow with the column
+
+
+def estimate_count(n, fraction, confidence=Constants.CONFIDENCE.value):
+    """estimate of a count in the whole table from the count n in a sample of a fraction of its rows,
+    treating each row as sampled independently (so intervals are a little narrow for block sampling)
+        n: count, or array of counts, in the sample
+        (returns): (estimate, lower, upper) with lower never below the count seen in the sample"""
+    n = np.asarray(n, dtype=float)
+    z = NormalDist().inv_cdf((1 + confidence) / 2)
+    estimate = n / fraction
+    margin = z * np.sqrt(n * (1 - fraction)) / fraction
+    return estimate, np.maximum(estimate - margin, n), estimate + margin
+
+
+class hyperloglog():
+    """approximate count of distinct values (HyperLogLog) in 2**precision one-byte registers however many
+    values are added, eg. for ID columns too big to hold a set of - sketches of the parts of a column
+    merge into the sketch of the whole
+        precision: 4 to 18 - the relative standard error is 1.04 / sqrt(2**precision)"""
+    def __init__(self, precision=Constants.HLL_PRECISION.value):
+        if not 4 <= precision <= 18:
+            raise KeyError("hyperloglog precision must be from 4 to 18")
+        self.precision = precision
+        self.registers = np.zeros(1 << precision, dtype=np.uint8)
+
+    def update(self, values, distinct=False):
+        """add values to the sketch
+            values: array or series of values - nulls are skipped
+            distinct: whether values has no repeats, so text needn't be deduplicated before hashing
+        (returns): the sketch"""
+        values = pd.Series(values, copy=False)
+        width = 64 - self.precision
+        for start in range(0, values.shape[0], Constants.HLL_BLOCK.value):
+            block = values.iloc[start:start + Constants.HLL_BLOCK.value]
+            block = block[block.notna()]
+            if block.dtype == 'O' and pd.api.types.infer_dtype(block, skipna=False) != 'string':
+                # other objects are hashed as text, but mustn't be counted as the same as text (1 and '1')
+                block = block.map(lambda x: x if isinstance(x, str) else "\x00%s" % x)
+            hashes = pd.util.hash_pandas_object(block, index=False, categorize=not distinct).to_numpy()
+            # rank is the position of the first 1 bit after the register number in the top precision bits
+            bits = np.frexp((hashes & np.uint64((1 << width) - 1)).astype(np.float64))[1]
+            np.maximum.at(self.registers, (hashes >> np.uint64(width)).astype(np.intp),
+                (width + 1 - bits).astype(np.uint8))
+        return self
+
+    def merge(self, other):
+        """add the values counted by another sketch of the same precision
+        (returns): the sketch"""
+        if other.precision != self.precision:
+            raise RuntimeError("Can't merge hyperloglog sketches of precision %d and %d" %
+                (self.precision, other.precision))
+        np.maximum(self.registers, other.registers, out=self.registers)
+        return self
+
+    @property
+    def error(self):
+        """relative standard error of the estimate"""
+        return 1.04 / np.sqrt(self.registers.shape[0])
+
+    def estimate(self, confidence=Constants.CONFIDENCE.value):
+        """(returns): (estimate, lower, upper) of the number of distinct values added, as integers"""
+        m = self.registers.shape[0]
+        alpha = {16: 0.673, 32: 0.697, 64: 0.709}.get(m, 0.7213 / (1 + 1.079 / m))
+        estimate = alpha * m * m / np.exp2(-self.registers.astype(float)).sum()
+        zeros = np.count_nonzero(self.registers == 0)
+        if estimate <= 2.5 * m and zeros:
+            # few values - count them from the empty registers instead
+            estimate = m * np.log(m / zeros)
+        margin = NormalDist().inv_cdf((1 + confidence) / 2) * self.error * estimate
+        return round(estimate), round(max(estimate - margin, 0)), round(estimate + margin)
+
+
+def _category_extremes(s):
+    """min and max of a categorical series - by the order of the categories if it is ordered, otherwise of the
+    categories present, eg. text made a category by compact()"""
+    if s.cat.ordered:
+        return s.min(), s.max()
+    codes = s.cat.codes.to_numpy()
+    present = s.cat.categories[np.unique(codes[codes >= 0])]
+    return (np.nan, np.nan) if present.empty else (present.min(), present.max())
+
+
+def _unique_values_text(n, approx):
+    return ("(~{0:d} unique values)" if approx else "({0:d} unique values)").format(n)
+
+
+class _profile():
+    """values of a series worked out once and shared by the fields of its minmax report -
+    text is hashed into unique values in one pass, and strings, lengths, number and date checks
+    are then done on the unique values instead of on every row
+        n_unique, precision: as for Series.minmax"""
+    def __init__(self, s, n_unique=Constants.N_UNIQUE.value[0], precision=Constants.HLL_PRECISION.value):
+        if n_unique not in Constants.N_UNIQUE.value:
+            raise KeyError("n_unique must be one of %s" % ", ".join(Constants.N_UNIQUE.value))
+        self._s = s
+        self.approx = n_unique == Constants.N_UNIQUE.value[1]
+        self._precision = precision
+
+    @cached_property
+    def _factorized(self):
+        """position of each row among the unique values, and the first row of each - values that are equal
+        but read differently as text (1, 1.0 and True, or Decimal 1.5 and 1.50) are kept apart, so
+        the text worked out from them is the same as from every row"""
+        codes, uniques = pd.factorize(self._s)
+        if self._s.dtype == 'O' and pd.api.types.infer_dtype(uniques, skipna=True) != 'string':
+            text_codes, texts = pd.factorize(self._s.astype(str).where(self._s.notna()))
+            # rows are the same when both their value and their text are, with nulls as nan
+            codes, _ = pd.factorize(np.where(codes < 0, np.nan, codes * (len(texts) + 1.0) + text_codes))
+            first = np.unique(codes, return_index=True)[1][int(self.n_null > 0):]
+            uniques = pd.Index(self._s.to_numpy()[first], dtype=object)
+        return codes, uniques
+
+    @cached_property
+    def _values(self):
+        """unique values, with equal values merged as nunique() does"""
+        return pd.unique(np.asarray(self._factorized[1], dtype=object)) if self._s.dtype == 'O' \
+            else self._factorized[1]
+
+    @cached_property
+    def n_null(self):
+        return self._s.isna().sum().item()
+
+    @property
+    def n_not_null(self):
+        return self._s.shape[0] - self.n_null
+
+    @cached_property
+    def sketch(self):
+        """approximate count of the distinct values - from the unique values of text, which are needed anyway,
+        otherwise from every value, so no table of unique values is built"""
+        if self._s.dtype == 'O':
+            return hyperloglog(self._precision).update(self._values, distinct=True)
+        return hyperloglog(self._precision).update(self._s)
+
+    @property
+    def n_unique(self):
+        return self.sketch.estimate()[0] if self.approx else len(self._values)
+
+    @cached_property
+    def _strings(self):
+        """unique values as text with nulls as '' (as s.fillna('').astype(str)) in order of first appearance,
+        and the position of each row's text among them"""
+        codes, uniques = self._factorized
+        strings = pd.Series(np.asarray(uniques, dtype=object), dtype=object).astype(str).to_numpy()
+        if self.n_null:
+            # '' goes where the first null appears, after the values seen before it
+            first_null = np.argmax(codes < 0)
+            at = codes[:first_null].max() + 1 if first_null else 0
+            strings = np.insert(strings, at, '')
+            codes = np.where(codes < 0, at, codes + (codes >= at))
+        string_codes, strings = pd.factorize(strings)
+        return strings, string_codes[codes]
+
+    @property
+    def strings(self):
+        return self._strings[0]
+
+    @property
+    def row_strings(self):
+        """position of each row's text in strings"""
+        return self._strings[1]
+
+    @cached_property
+    def lengths(self):
+        return pd.Series(self.strings, dtype=object).str.len()
+
+    @cached_property
+    def numbers(self):
+        """whether each of strings looks like a number"""
+        return pd.Series(self.strings, dtype=object).str.fullmatch(Constants.IS_NUMBER_REX.value).to_numpy()
+
+    def take(self, values):
+        """a row-length series from one value for each of strings"""
+        return Series(values.take(self.row_strings), index=self._s.index, name=self._s.name)
+
+
+_minmax_backends = ('thread', 'process')
+
+
+def _minmax_part(x, kwargs, part):
+    """minmax report of x, or the profile of its rows part[0] to part[1] (see ColumnProfile)"""
+    if part is None:
+        return x.minmax(**kwargs)
+    return ColumnProfile(**kwargs).update(x.iloc[part[0]:part[1]])
+
+
+def _minmax_column(x, attrs, kwargs, part=None):
+    """minmax report of one column (or the profile of part of it), run in a worker process"""
+    x = Series(x)
+    x.attrs.update(attrs)
+    return _minmax_part(x, kwargs, part)
+
+
+def _minmax_shared(buffer, shape, dtype, name, attrs, kwargs, part=None):
+    """minmax report of a column whose values are in the shared memory block buffer (or the profile of part of it),
+    run in a worker process"""
+    shm = shared_memory.SharedMemory(name=buffer)
+    try:
+        x = Series(np.ndarray(shape, dtype=dtype, buffer=shm.buf), name=name, copy=False)
+        x.attrs.update(attrs)
+        report = _minmax_part(x, kwargs, part)
+        del x
+    finally:
+        shm.close()
+    return report
+
+
+def _share(values):
+    """copy values into a new shared memory block
+    (returns): the block, which the caller unlinks once the workers are finished with it"""
+    shm = shared_memory.SharedMemory(create=True, size=max(values.nbytes, 1))
+    np.ndarray(values.shape, dtype=values.dtype, buffer=shm.buf)[:] = values
+    return shm
 
 
 class DataFrame(pd.DataFrame):
@@ -42,8 +271,83 @@ class DataFrame(pd.DataFrame):
     def set_header(self, colnames:list):
         return self.set_axis(colnames, axis="columns") if colnames else self
 
-    def minmax(self, **kwargs):
-        return DataFrame([x.minmax(**kwargs[n]) if n in kwargs else x.minmax() for n,x in self.items()])
+    def minmax(self, workers=None, backend='thread', chunksize=None, n_unique=None, **kwargs):
+        """minmax report of each column (see Series.minmax), one row per column
+            workers: (optional) number of columns profiled at once, by default one after another
+            backend: 'thread' to profile in threads of this process, or 'process' to use worker processes -
+                numeric and date columns reach them through shared memory rather than as pickled copies
+            chunksize: (optional) with workers, columns with more rows than this are profiled a chunk at a time
+                in parallel and the profiles merged (see ColumnProfile) - except text parsed as dates without
+                a format, which is only inferred from the whole column
+            n_unique: (optional) "approx" to estimate the distinct values of every column (see Series.minmax)
+            kwargs: column name to dict of arguments for that column's minmax, eg. forename={'stype': 'text'}"""
+        if backend not in _minmax_backends:
+            raise KeyError("minmax backend must be one of %s" % ", ".join(_minmax_backends))
+        if n_unique is not None:
+            kwargs = {n: {'n_unique': n_unique, **kwargs.get(n, {})} for n in self.columns}
+        columns = list(self.items())
+        tasks = [] # column position and the rows to profile, or None for the whole column
+        for i, (n, x) in enumerate(columns):
+            kw = kwargs.get(n, {})
+            if workers and chunksize and x.shape[0] > chunksize and \
+                    not (kw.get('stype') == Constants.USER_SDATE.value and 'format' not in kw):
+                tasks += [(i, (start, start + chunksize)) for start in range(0, x.shape[0], chunksize)]
+            else:
+                tasks.append((i, None))
+        if not workers or workers == 1 or len(tasks) < 2:
+            return DataFrame([x.minmax(**kwargs[n]) if n in kwargs else x.minmax() for n,x in columns])
+        if backend == 'thread':
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                results = list(executor.map(lambda task: _minmax_part(columns[task[0]][1],
+                    kwargs.get(columns[task[0]][0], {}), task[1]), tasks))
+        else:
+            results = self._minmax_processes(columns, tasks, workers, kwargs)
+        reports = {}
+        for (i, part), result in zip(tasks, results, strict=True):
+            if part is None:
+                reports[i] = result
+            else:
+                reports[i] = result if part[0] == 0 else reports[i].merge(result)
+        return DataFrame([x if isinstance(x, dict) else x.report() for x in reports.values()])
+
+    def _minmax_processes(self, columns, tasks, workers, kwargs):
+        """the results of minmax tasks run in worker processes"""
+        blocks = {}
+        try:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                futures = []
+                for i, part in tasks:
+                    n, x = columns[i]
+                    if isinstance(x.dtype, np.dtype) and x.dtype.kind in Constants.SHARED_KIND.value:
+                        values = x.to_numpy()
+                        if i not in blocks:
+                            blocks[i] = _share(values)
+                        futures.append(executor.submit(_minmax_shared, blocks[i].name, values.shape,
+                            values.dtype.str, n, x.attrs, kwargs.get(n, {}), part))
+                    else:
+                        futures.append(executor.submit(_minmax_column, x if part is None else x.iloc[part[0]:part[1]],
+                            x.attrs, kwargs.get(n, {}), None if part is None else (0, part[1] - part[0])))
+                return [f.result() for f in futures]
+        finally:
+            for shm in blocks.values():
+                shm.close()
+                shm.unlink()
+
+    def compact(self, types=None, sample=None):
+        """return the dataframe with each column in the smallest dtype that holds its values -
+        categories for repetitive text, nullable small integers, booleans and datetimes
+            types: (optional) dict of column name to 'integer', 'boolean', 'date' or 'string'
+                (eg. from the database column types); other columns are inferred from their values
+            sample: (optional) number of values to check when deciding whether text is categorical
+        the memory used before and after is reported in .attrs['compact']"""
+        types = types or {}
+        df = self.copy(deep=False)
+        for i, (n, x) in enumerate(self.items()):
+            df.isetitem(i, Series(x).compact(kind=types.get(n), sample=sample))
+        before = int(self.memory_usage(index=False, deep=True).sum())
+        after = int(df.memory_usage(index=False, deep=True).sum())
+        df.attrs['compact'] = {'bytes_before': before, 'bytes_after': after, 'bytes_saved': before - after}
+        return df
 
 
 class Series(pd.Series):
@@ -55,17 +359,67 @@ class Series(pd.Series):
     def _constructor_expanddim(self):
         return DataFrame
 
-    def _get_strings_as_dates(self, **kwargs):
+    @staticmethod
+    def _infer_kind(values):
+        """'integer', 'boolean', 'date' or 'string' if all the (non-null) values are of that kind"""
+        if values.dtype == bool:
+            return 'boolean'
+        if values.dtype.kind in 'iu':
+            return 'integer'
+        if values.dtype.kind == 'f':
+            return 'integer' if (values == np.floor(values)).all() else None
+        if values.dtype.kind == 'M':
+            return None
+        kinds = set(values.map(lambda x: 'boolean' if isinstance(x, (bool, np.bool_)) else
+            'integer' if isinstance(x, (int, np.integer)) else
+            'date' if isinstance(x, date) else
+            'string' if isinstance(x, str) else None).unique())
+        return kinds.pop() if len(kinds) == 1 else None
+
+    def compact(self, kind=None, sample=None):
+        """return the series in the smallest dtype that holds its values
+            kind: (optional) 'integer', 'boolean', 'date' or 'string', otherwise inferred from the values
+            sample: (optional) number of values to check when deciding whether text is categorical"""
+        values = self.dropna()
+        if values.empty:
+            return self
+        kind = kind or self._infer_kind(values)
+        try:
+            if kind == 'boolean':
+                return self.astype('boolean')
+            if kind == 'integer':
+                numbers = pd.to_numeric(self) if self.dtype == 'O' else self
+                lo, hi = numbers.min(), numbers.max()
+                for dtype in Constants.INT_DTYPES.value:
+                    info = np.iinfo(dtype.lower())
+                    if info.min <= lo and hi <= info.max:
+                        return numbers.astype(dtype)
+            if kind == 'date':
+                return Series(pd.to_datetime(self), name=self.name)
+            if kind == 'string':
+                checked = values.sample(n=sample, random_state=0) if sample and sample < values.size else values
+                if checked.nunique() <= checked.size * Constants.CATEGORY_RATIO.value:
+                    return self.astype('category')
+        except (TypeError, ValueError, OverflowError):
+            pass
+        return self
+
+    def _get_strings_as_dates(self, p=None, **kwargs):
+        p = p or _profile(self)
         d = None
         try:
             warnings.filterwarnings("error")
-            d = pd.to_datetime(self.fillna('').astype(str), errors='coerce', **kwargs)
+            # values seen more than once go in twice, as pandas only warns that it can't infer
+            # the format when there's more than one value to parse
+            repeated = p.strings[np.bincount(p.row_strings, minlength=p.strings.shape[0]) > 1]
+            d = p.take(pd.to_datetime(pd.Series(np.concatenate([p.strings, repeated]), dtype=object),
+                errors='coerce', **kwargs).array[:p.strings.shape[0]])
             warnings.resetwarnings()
         except Exception:
             print("Unable to parse strings as dates - fallback to strings") # should be logged when logging implemented
         return d
 
-    def _guess_date_format(self, **kwargs):
+    def _guess_date_format(self, p=None, **kwargs):
         """guesses what the date format is if the series is made up of strings
         accepts:
             dayfirst=False
@@ -73,8 +427,11 @@ class Series(pd.Series):
             format: date format that occurs most frequently
             errors: number of cases not meeting this format
             None:  if less than PROP_DATES_THRESH is a consistent date format"""
+        p = p or _profile(self)
         passargs = [x for x in kwargs.keys() if x in getfullargspec(guess_datetime_format).args]
-        dateformats = self.astype(str).apply(guess_datetime_format, args=passargs).value_counts(dropna=False)
+        # nulls are '' in p.strings rather than 'None' or 'nan', neither of which has a date format
+        dateformats = p.take(np.array([guess_datetime_format(x, *passargs) for x in p.strings], dtype=object))\
+            .value_counts(dropna=False)
         n_matched_format = dateformats.max().item()
         returnvalue = None
         if dateformats.idxmax() is not None and n_matched_format > \
@@ -84,38 +441,35 @@ class Series(pd.Series):
                 'errors': self.shape[0] - n_matched_format}
         return returnvalue
 
-    def _flag_numbers_as_str(self):
+    def _flag_numbers_as_str(self, p=None):
         """returns a series of boolean indicating whether values are numbers"""
-        return self.astype(str).replace(['','None'],None).str\
-            .fullmatch(Constants.IS_NUMBER_REX.value, na=False)
+        p = p or _profile(self)
+        return p.take(p.numbers)
 
-    def _process_text_as_date(self, **kwargs):
+    def _process_text_as_date(self, p=None, **kwargs):
         """analyse the text series as dates"""
-        dates = self._get_strings_as_dates(**kwargs)
+        p = p or _profile(self)
+        dates = self._get_strings_as_dates(p, **kwargs)
         if dates is not None:
             not_dates = self[dates.isna()]
             format = kwargs.get('format')
             dateformat={'errors': None}
             if format is None:
-                dateformat = self._guess_date_format(**kwargs)
+                dateformat = self._guess_date_format(p, **kwargs)
                 format = dateformat['format'] if dateformat is not None else None
             min = dates.min().strftime(format)
             max = dates.max().strftime(format)
-            n_unique_not_dates = not_dates.unique().shape[0]
+            unique_not_dates = not_dates.unique()
             unique_values = ["%s to %s" % (str(min), str(max))]
-            if n_unique_not_dates <= Constants.FACTOR_THRESH.value:
-                unique_values += not_dates.unique().tolist()
+            if unique_not_dates.shape[0] <= Constants.FACTOR_THRESH.value:
+                unique_values += unique_not_dates.tolist()
             else:
-                char_count = Counter()
-                self_as_str = self.fillna('').astype(str)
-                for x in self_as_str.to_numpy():
-                    char_count.update(x)
-                unique_values.append("".join(char_count.keys()))
+                unique_values.append(char_inventory(p.strings))
             return {
                 'min': min,
                 'max': max,
-                'n_null': self.isna().sum().item(),
-                'n_not_null': self.notna().sum().item(),
+                'n_null': p.n_null,
+                'n_not_null': p.n_not_null,
                 'errors': dateformat['errors'],
                 'type': Constants.SDATE_TYPE.value,
                 'elements': unique_values
@@ -123,10 +477,15 @@ class Series(pd.Series):
         else:
             return None
 
-    def _process_text_as_number(self, number_filter=None):
+    def _process_text_as_number(self, number_filter=None, p=None):
+        p = p or _profile(self)
         if number_filter is None:
-            number_filter = self._flag_numbers_as_str()
-        only_numbers = self[number_filter]
+            number_filter = self._flag_numbers_as_str(p)
+        # every number is one of the unique strings flagged as a number, so min and max can come from those
+        codes, uniques = p._factorized
+        numbers = np.zeros(len(uniques), dtype=bool)
+        numbers[codes[number_filter.to_numpy()]] = True
+        only_numbers = pd.Series(np.asarray(uniques, dtype=object)[numbers], dtype=object)
         try:
             s_numbers=pd.to_numeric(only_numbers)
         except Exception as e:
@@ -137,131 +496,552 @@ class Series(pd.Series):
             not_numbers = self[~number_filter]
         else:
             not_numbers = pd.Series()
-        n_unique_not_numbers = not_numbers.unique().shape[0]
+        unique_not_numbers = not_numbers.unique()
         unique_values = ["%s to %s" % (str(min), str(max))]
-        if n_unique_not_numbers <= Constants.FACTOR_THRESH.value:
-            unique_values += not_numbers.unique().tolist()
+        if unique_not_numbers.shape[0] <= Constants.FACTOR_THRESH.value:
+            unique_values += unique_not_numbers.tolist()
         else:
-            char_count = Counter()
-            for x in not_numbers.fillna('').astype(str).to_numpy():
-                char_count.update(x)
-            unique_values.append("".join(char_count.keys()))
+            unique_values.append(char_inventory(pd.Series(unique_not_numbers, dtype=object).fillna('').astype(str)))
         return {
             'min': min,
             'max': max,
             'type': Constants.SNUM_TYPE.value,
-            'n_null': self.isna().sum().item(),
-            'n_not_null': self.notna().sum().item(),
+            'n_null': p.n_null,
+            'n_not_null': p.n_not_null,
             'elements': unique_values
         }
 
-    def _process_as_text(self):
-            char_count = Counter()
-            self_as_str = self.fillna('').astype(str)
-            unique_values = None
-            n_unique = self_as_str.nunique()
-            if n_unique <= Constants.FACTOR_THRESH.value:
-                unique_values = self_as_str.unique().tolist()
+    def _process_as_text(self, p=None):
+            p = p or _profile(self)
+            if p.strings.shape[0] <= Constants.FACTOR_THRESH.value:
+                unique_values = p.strings.tolist()
             else:
-                char_count = Counter()
-                for x in self_as_str.fillna('').astype(str).to_numpy():
-                    char_count.update(x)
-                unique_values = "".join(char_count.keys())
+                unique_values = char_inventory(p.strings)
             return {
-                'min': int(self.fillna('').astype(str).str.len().min()),
-                'max': int(self.fillna('').astype(str).str.len().max()),
-                'n_null': self.isna().sum().item(),
-                'n_not_null': self.notna().sum().item(),
+                'min': int(p.lengths.min()),
+                'max': int(p.lengths.max()),
+                'n_null': p.n_null,
+                'n_not_null': p.n_not_null,
                 'elements': unique_values,
                 'type': Constants.STR_TYPE.value
             }
 
-    def _minmax_string(self, stype, **kwargs):
+    def _minmax_string(self, stype, p=None, **kwargs):
         #coordinate all string processing
+        p = p or _profile(self)
         if stype == Constants.USER_STEXT.value:
-            r = self._process_as_text()
+            r = self._process_as_text(p)
         elif stype == Constants.USER_SDATE.value:
-            r = self._process_text_as_date(**kwargs)
+            r = self._process_text_as_date(p, **kwargs)
             if r is None:
-                r = self._process_as_text()
+                r = self._process_as_text(p)
             return r
         else:
-            filter = self._flag_numbers_as_str()
+            filter = self._flag_numbers_as_str(p)
             isnumbers = filter is not None and \
-                self[~self.isna()].shape[0] > 0 and\
-                (0.00 + filter.sum() / self[~self.isna()].shape[0]) > Constants.PROP_NUMBERS_THRESH.value
+                p.n_not_null > 0 and\
+                (0.00 + filter.sum() / p.n_not_null) > Constants.PROP_NUMBERS_THRESH.value
             if stype == Constants.USER_SNUM.value or isnumbers:
-                r = self._process_text_as_number(filter)
+                r = self._process_text_as_number(filter, p)
             else:
-                r = self._process_as_text()
+                r = self._process_as_text(p)
         return r
 
-    def _element_summary(self):
+    def _element_summary(self, p=None):
         """summary of elements of a continuous or semi-continuous variable such as number or time"""
-        head = self[~self.isna()][:Constants.UNIQUE_RANGE.value]
-        uniq_vals = head.unique()
-        return ["({0:d} unique values)".format(self[~self.isna()].unique().size)] \
+        p = p or _profile(self)
+        # the first UNIQUE_RANGE non-null values, from as few of the first rows as will give them
+        size = Constants.UNIQUE_RANGE.value
+        while True:
+            head = self[:size]
+            head = head[~head.isna()]
+            if head.shape[0] >= Constants.UNIQUE_RANGE.value or size >= self.shape[0]:
+                break
+            size *= 2
+        uniq_vals = head[:Constants.UNIQUE_RANGE.value].unique()
+        return [_unique_values_text(p.n_unique, p.approx)] \
             + (uniq_vals[:Constants.FACTOR_THRESH.value].tolist() \
             if uniq_vals.size <= Constants.FACTOR_THRESH.value else \
             uniq_vals[:Constants.FACTOR_THRESH.value].tolist() + ['...'])
 
-    def minmax(self, stype = None, *args, **kwargs):
+    def minmax(self, stype = None, *args, n_unique="exact", precision=Constants.HLL_PRECISION.value, **kwargs):
         """use:
             s.minmax() # if it is a series of dates, numbers or categories stored in non-text format
             s.minmax(stype="number") # if it is a series of numbers stored as strings
             s.minmax(stype="text") # if it is a series of free text values (speeds processing)
             s.minmax(format="%d%m%Y") # if it is a series of dates stored as strings(speeds processing)
             s.minmax(dayfirst=True, yearlast=True) # a series of dates stored as strings withoug explicitly
-                    specifying format"""
-        report = {'name': self.name, 'type': Constants.UNKNOWN_TYPE.value, 'n_unique': self.nunique(),
+                    specifying format
+            s.minmax(n_unique="approx") # estimate the number of distinct values with a hyperloglog sketch
+                    of 2**precision registers instead of counting them, eg. for large ID columns - the report
+                    then has n_unique_range, the interval the true count is in with 95% confidence"""
+        if n_unique == Constants.N_UNIQUE.value[1] and self.dtype == 'O' and self.shape[0]:
+            # text is profiled in blocks, so no table of its unique values is built for the whole column
+            profile = ColumnProfile(self.name, stype, n_unique, precision, **kwargs)
+            for start in range(0, self.shape[0], Constants.HLL_BLOCK.value):
+                profile.update(self.iloc[start:start + Constants.HLL_BLOCK.value])
+            return profile.report()
+        # nulls, unique values and text conversions are worked out once and shared by every field
+        p = _profile(self, n_unique, precision)
+        report = {'name': self.name, 'type': Constants.UNKNOWN_TYPE.value, 'n_unique': p.n_unique,
                     'min': None, 'max': None, 'errors': None, 'elements': None,
                     }
+        if p.approx:
+            report['n_unique_range'] = p.sketch.estimate()[1:]
         if self.dtype.kind in Constants.NUMERIC_KIND.value:
             report.update({
                 'type': Constants.NUMERIC_TYPE.value,
                 'min': self.min().item(),
                 'max': self.max().item(),
-                'n_null': self.isna().sum().item(),
-                'n_not_null': self.notna().sum().item(),
-                'elements': self._element_summary()
+                'n_null': p.n_null,
+                'n_not_null': p.n_not_null,
+                'elements': self._element_summary(p)
                 })
         elif is_datetime_64(self):
             report.update({
                 'type': Constants.DATE_TYPE.value,
                 'min': self.min().date(),
                 'max': self.max().date(),
-                'n_null': self.isna().sum().item(),
-                'n_not_null': self.notna().sum().item(),
-                'elements': self._element_summary()
+                'n_null': p.n_null,
+                'n_not_null': p.n_not_null,
+                'elements': self._element_summary(p)
             })
         elif is_timedelta_64(self):
             report.update({
                 'type': Constants.TDELTA_TYPE.value,
                 'min': self.min(),
                 'max': self.max(),
-                'n_null': self.isna().sum().item(),
-                'n_not_null': self.notna().sum().item(),
-                'elements': self._element_summary()
+                'n_null': p.n_null,
+                'n_not_null': p.n_not_null,
+                'elements': self._element_summary(p)
             })
         elif self.dtype == 'category':
+            min, max = _category_extremes(self)
             report.update({
-                'min': self.min(),
-                'max': self.max(),
-                'n_null': self.isna().sum().item(),
-                'n_not_null': self.notna().sum().item(),
+                'min': min,
+                'max': max,
+                'n_null': p.n_null,
+                'n_not_null': p.n_not_null,
                 'type': Constants.CAT_TYPE.value,
                 'elements': self.dtype.categories.to_list()
             })
         elif self.dtype == 'O':
-            report.update(self._minmax_string(stype, **kwargs))
+            report.update(self._minmax_string(stype, p, **kwargs))
         else:
             try:
                 report.update({
                     'min': self.min(),
                     'max': self.max(),
-                    'n_null': self.isna().sum().item(),
-                    'n_not_null': self.notna().sum().item(),
+                    'n_null': p.n_null,
+                    'n_not_null': p.n_not_null,
                 })
             finally:
                 report.update({'type': self.dtype})
+        if 'sample' in self.attrs:
+            report['estimates'] = self._sample_estimates(self.attrs['sample']['fraction'])
+        return report
+
+    def _sample_estimates(self, fraction):
+        """row and null counts for the whole table when the series is a sample (see get_table(sample=...))"""
+        counts = {'n_rows': len(self), 'n_null': self.isna().sum().item(), 'n_not_null': self.notna().sum().item()}
+        return {k: tuple(round(x.item()) for x in estimate_count(n, fraction)) for k, n in counts.items()}
+
+
+def _first_unique(seen, values):
+    """the first FACTOR_THRESH + 1 distinct values of seen followed by values - enough to list them all when
+    there are no more than FACTOR_THRESH - looking at as few of values as will give them"""
+    limit = Constants.FACTOR_THRESH.value + 1
+    seen, values = np.asarray(seen, dtype=object), np.asarray(values, dtype=object)
+    size = limit
+    while True:
+        found = pd.unique(np.concatenate([seen, values[:size]]))
+        if found.shape[0] >= limit or size >= values.shape[0]:
+            return found[:limit]
+        size *= 2
+
+
+def _number_sample(values):
+    """the smallest and largest of values, the first of them and the first of each kind that pd.to_numeric
+    treats differently (python ints, bools, whole and fractional floats, text of whole numbers and other
+    text) - which between them convert to the same type as all of values, as that depends on the first value
+    and the kinds there are"""
+    values = pd.Series(values, dtype=object).reset_index(drop=True)
+    if values.empty:
+        return values
+    numbers = pd.to_numeric(values)
+    keep = {0, numbers.idxmin(), numbers.idxmax()}
+    whole_text = r'\s*[+-]?\d+\s*'
+    if pd.api.types.infer_dtype(values, skipna=True) == 'string':
+        # only text that isn't a whole number makes the rest floats, so look for the first of it if they are
+        size = 1
+        while numbers.dtype.kind == 'f':
+            other = ~values[:size].str.fullmatch(whole_text)
+            if other.any() or size >= values.shape[0]:
+                keep.add(other.idxmax())
+                break
+            size *= 2
+    else:
+        kinds = values.map(lambda x: type(x).__name__ + (' whole' if isinstance(x, float) and x.is_integer() else ''))
+        text = kinds == 'str'
+        kinds[text] = np.where(values[text].str.fullmatch(whole_text), 'whole text', 'text')
+        keep.update(kinds.index[~kinds.duplicated()])
+    return values[sorted(keep)]
+
+
+def _not_null_text(strings):
+    """strings from which pandas infers a date format - not '', 'NaT', 'nan' and so on"""
+    return [x for x in strings if x and x not in Constants.NULL_TEXT.value]
+
+
+class ColumnProfile():
+    """minmax report of a column built up a chunk at a time (see Series.minmax), for columns that don't fit in
+    memory at once, eg. csv files read with chunksize, query_iter() results or partitions profiled in parallel
+        name: (optional) name of the column, otherwise taken from the first chunk
+        stype, n_unique, precision, kwargs: as for Series.minmax - with n_unique="approx" the profile keeps a
+            hyperloglog sketch in place of the distinct values, so its size doesn't grow with the column
+    use:
+        profile = ColumnProfile(stype="text")
+        for chunk in pd.read_csv(path, chunksize=100000):
+            profile.update(chunk["forename"])
+        profile.report() # the same as Series.minmax(stype="text") on the whole column
+    profiles of consecutive parts of a column are combined with merge() - text parsed as dates without a format
+    can only be combined when the parts infer the same format, as the whole column would be parsed with the
+    format of its first date"""
+    def __init__(self, name=None, stype=None, n_unique="exact", precision=Constants.HLL_PRECISION.value, **kwargs):
+        if n_unique not in Constants.N_UNIQUE.value:
+            raise KeyError("n_unique must be one of %s" % ", ".join(Constants.N_UNIQUE.value))
+        self.name = name
+        self.stype = stype
+        self.kwargs = kwargs
+        self.approx = n_unique == Constants.N_UNIQUE.value[1]
+        self._precision = precision
+        self._sketch = hyperloglog(precision) if self.approx else None
+        self.n_rows = 0
+        self.n_null = 0
+        self._fraction = None
+        self._probe = None # first value of each chunk, whose dtype is that of the column as a whole
+        self._uniques = None # distinct non-null values
+        self._extremes = None # min and max of each chunk of numbers, dates or categories
+        self._head = None # first UNIQUE_RANGE non-null values, for the element summary
+        # text
+        self._strings = np.array([], dtype=object) # first distinct values as text with nulls as ''
+        self._chars = ""
+        self._lengths = None
+        self._n_numbers = 0
+        self._number_sample = None # numbers (as they were, not converted) that give their type, min and max
+        self._not_numbers = np.array([], dtype=object) # first distinct values that aren't numbers
+        self._not_number_chars = ""
+        # text as dates - format is the one given or inferred from the first date, candidate whether a date
+        # has been seen to infer it from, undated whether that had no format and nothing parsed as a date,
+        # and failed whether the text couldn't be parsed as dates
+        self._date = {'format': kwargs.get('format'), 'given': 'format' in kwargs, 'candidate': False,
+            'failed': False, 'undated': False, 'extremes': None, 'not_dates': np.array([], dtype=object), 'formats': {}}
+
+    @staticmethod
+    def _branch(dtype):
+        """which part of Series.minmax reports on a column of dtype"""
+        if dtype.kind in Constants.NUMERIC_KIND.value:
+            return Constants.NUMERIC_TYPE.value
+        if is_datetime_64(dtype):
+            return Constants.DATE_TYPE.value
+        if is_timedelta_64(dtype):
+            return Constants.TDELTA_TYPE.value
+        if dtype == 'category':
+            return Constants.CAT_TYPE.value
+        if dtype == 'O':
+            return Constants.STR_TYPE.value
+        return None
+
+    @property
+    def dtype(self):
+        return None if self._probe is None else self._probe.dtype
+
+    @staticmethod
+    def _concat(*values):
+        return pd.concat([x for x in values if x is not None], ignore_index=True)
+
+    def _combine_probe(self, probe):
+        """the probe of the column with probe added, checking that its values are still reported on the same way"""
+        if self._probe is None:
+            return probe
+        combined = self._concat(self._probe, probe)
+        if self._branch(combined.dtype) != self._branch(self._probe.dtype) or \
+                self._branch(combined.dtype) is None and combined.dtype != self._probe.dtype:
+            raise RuntimeError("Can't combine %s with %s in column: %s - read the chunks with a fixed dtype" %
+                (probe.dtype, self._probe.dtype, self.name))
+        return combined
+
+    def update(self, chunk):
+        """add the next chunk of the column to the profile
+            chunk: series (or array) of values
+        (returns): the profile"""
+        attrs = getattr(chunk, 'attrs', {})
+        chunk = Series(chunk)
+        if chunk.shape[0] == 0:
+            return self
+        if self.name is None:
+            self.name = chunk.name
+        if self._fraction is None and 'sample' in attrs:
+            self._fraction = attrs['sample']['fraction']
+        self._probe = self._combine_probe(chunk.iloc[:1].reset_index(drop=True))
+        p = _profile(chunk, Constants.N_UNIQUE.value[self.approx], self._precision)
+        self.n_rows += chunk.shape[0]
+        self.n_null += p.n_null
+        if self.approx:
+            self._sketch.merge(p.sketch)
+        else:
+            self._uniques = self._concat(self._uniques, pd.Series(p._values)).drop_duplicates()
+        branch = self._branch(chunk.dtype)
+        if branch == Constants.STR_TYPE.value:
+            self._update_text(chunk, p)
+        else:
+            extremes = _category_extremes(chunk) if branch == Constants.CAT_TYPE.value else (chunk.min(), chunk.max())
+            self._extremes = self._concat(self._extremes, pd.Series(extremes, dtype=chunk.dtype))
+            if branch in (Constants.NUMERIC_TYPE.value, Constants.DATE_TYPE.value, Constants.TDELTA_TYPE.value):
+                remaining = Constants.UNIQUE_RANGE.value - (0 if self._head is None else self._head.shape[0])
+                if remaining > 0:
+                    self._head = self._concat(self._head, chunk[~chunk.isna()][:remaining])
+        return self
+
+    def _update_text(self, chunk, p):
+        self._strings = _first_unique(self._strings, p.strings)
+        self._chars = char_inventory([self._chars, char_inventory(p.strings)])
+        lengths = (int(p.lengths.min()), int(p.lengths.max()))
+        self._lengths = lengths if self._lengths is None else \
+            (min(self._lengths[0], lengths[0]), max(self._lengths[1], lengths[1]))
+        if self.stype == Constants.USER_SDATE.value:
+            self._update_dates(chunk, p)
+        elif self.stype != Constants.USER_STEXT.value:
+            number_filter = chunk._flag_numbers_as_str(p)
+            self._n_numbers += number_filter.sum().item()
+            codes, uniques = p._factorized
+            numbers = np.zeros(len(uniques), dtype=bool)
+            numbers[codes[number_filter.to_numpy()]] = True
+            if numbers.any():
+                try:
+                    self._number_sample = _number_sample(self._concat(self._number_sample,
+                        pd.Series(np.asarray(uniques, dtype=object)[numbers], dtype=object)))
+                except Exception as e:
+                    raise RuntimeError("Error in converting to number in column: %s" % self.name) from e
+            self._not_numbers = _first_unique(self._not_numbers, chunk[~number_filter])
+            # the strings that aren't numbers have the characters of the values that aren't, in the same order
+            self._not_number_chars = char_inventory([self._not_number_chars, char_inventory(p.strings[~p.numbers])])
+
+    def _update_dates(self, chunk, p):
+        d = self._date
+        if d['failed']:
+            return
+        candidates = _not_null_text(p.strings)
+        kwargs = dict(self.kwargs)
+        if d['format'] is not None:
+            kwargs['format'] = d['format']
+        elif d['candidate'] and candidates:
+            # the first date had no recognisable format, so the whole column would be parsed value by value
+            d['failed'] = True
+        if not d['failed']:
+            with warnings.catch_warnings():
+                warnings.simplefilter("error")
+                try:
+                    # as in _get_strings_as_dates, values seen more than once go in twice
+                    repeated = p.strings[np.bincount(p.row_strings, minlength=p.strings.shape[0]) > 1]
+                    dates = p.take(pd.to_datetime(pd.Series(np.concatenate([p.strings, repeated]), dtype=object),
+                        errors='coerce', **kwargs).array[:p.strings.shape[0]])
+                    if candidates and not d['candidate'] and d['format'] is None:
+                        d['format'] = guess_datetime_format(candidates[0],
+                            dayfirst=self.kwargs.get('dayfirst', False))
+                        d['undated'] = d['format'] is None and dates.isna().all()
+                except Exception:
+                    d['failed'] = True
+        d['candidate'] = d['candidate'] or bool(candidates)
+        if d['failed']:
+            print("Unable to parse strings as dates - fallback to strings") # should be logged when logging implemented
+            return
+        d['extremes'] = self._concat(d['extremes'], pd.Series([dates.min(), dates.max()]))
+        d['not_dates'] = _first_unique(d['not_dates'], chunk[dates.isna()])
+        passargs = [x for x in self.kwargs.keys() if x in getfullargspec(guess_datetime_format).args]
+        formats = np.array([guess_datetime_format(x, *passargs) for x in p.strings], dtype=object)
+        counts = np.bincount(p.row_strings, minlength=p.strings.shape[0])
+        for f, n in zip(formats, counts, strict=True):
+            d['formats'][f] = d['formats'].get(f, 0) + n.item()
+
+    def merge(self, other):
+        """add the profile of the next part of the column
+        (returns): the profile"""
+        if other._probe is None:
+            return self
+        if self._probe is None:
+            self.__dict__.update(copy.deepcopy(other.__dict__))
+            return self
+        self._probe = self._combine_probe(other._probe)
+        self.name = self.name if self.name is not None else other.name
+        self._fraction = self._fraction if self._fraction is not None else other._fraction
+        self.n_rows += other.n_rows
+        self.n_null += other.n_null
+        if self.approx != other.approx:
+            raise RuntimeError("Can't merge exact and approximate distinct counts in column: %s" % self.name)
+        if self.approx:
+            self._sketch.merge(other._sketch)
+        else:
+            self._uniques = self._concat(self._uniques, other._uniques).drop_duplicates()
+        self._extremes = None if self._extremes is None and other._extremes is None else \
+            self._concat(self._extremes, other._extremes)
+        remaining = Constants.UNIQUE_RANGE.value - (0 if self._head is None else self._head.shape[0])
+        if other._head is not None and remaining > 0:
+            self._head = self._concat(self._head, other._head[:remaining])
+        self._strings = _first_unique(self._strings, other._strings)
+        self._chars = char_inventory([self._chars, other._chars])
+        if other._lengths is not None:
+            self._lengths = other._lengths if self._lengths is None else \
+                (min(self._lengths[0], other._lengths[0]), max(self._lengths[1], other._lengths[1]))
+        self._n_numbers += other._n_numbers
+        if other._number_sample is not None:
+            self._number_sample = _number_sample(self._concat(self._number_sample, other._number_sample))
+        self._not_numbers = _first_unique(self._not_numbers, other._not_numbers)
+        self._not_number_chars = char_inventory([self._not_number_chars, other._not_number_chars])
+        self._merge_dates(other._date)
+        return self
+
+    def _merge_dates(self, other):
+        d = self._date
+        if d['failed'] or not other['candidate'] and not other['failed']:
+            pass
+        elif d['given'] or d['format'] is not None and d['format'] == other['format']:
+            d['failed'] = other['failed']
+        elif not d['candidate']:
+            d.update({k: other[k] for k in ('format', 'candidate', 'undated', 'failed')})
+        elif d['format'] is None:
+            # the first date had no recognisable format, so the whole column would be parsed value by value
+            d['failed'] = True
+        elif not (other['format'] is None and other['undated'] and not other['failed']):
+            raise RuntimeError("Can't combine dates inferred as %s with dates inferred as %s in column: %s - "
+                "give the format" % (d['format'], other['format'], self.name))
+        if d['failed']:
+            return
+        if other['extremes'] is not None:
+            d['extremes'] = self._concat(d['extremes'], other['extremes'])
+        d['not_dates'] = _first_unique(d['not_dates'], other['not_dates'])
+        for f, n in other['formats'].items():
+            d['formats'][f] = d['formats'].get(f, 0) + n
+
+    @property
+    def n_not_null(self):
+        return self.n_rows - self.n_null
+
+    @property
+    def n_unique(self):
+        if self.approx:
+            return self._sketch.estimate()[0]
+        return 0 if self._uniques is None else self._uniques.shape[0]
+
+    def _element_summary(self):
+        uniq_vals = self._head.unique() if self._head is not None else np.array([])
+        return [_unique_values_text(self.n_unique, self.approx)] \
+            + (uniq_vals[:Constants.FACTOR_THRESH.value].tolist() \
+            if uniq_vals.size <= Constants.FACTOR_THRESH.value else \
+            uniq_vals[:Constants.FACTOR_THRESH.value].tolist() + ['...'])
+
+    def _text_report(self):
+        return {
+            'min': self._lengths[0],
+            'max': self._lengths[1],
+            'n_null': self.n_null,
+            'n_not_null': self.n_not_null,
+            'elements': self._strings.tolist() if self._strings.shape[0] <= Constants.FACTOR_THRESH.value else
+                self._chars,
+            'type': Constants.STR_TYPE.value
+        }
+
+    def _date_report(self):
+        d = self._date
+        format = self.kwargs.get('format')
+        dateformat = {'errors': None}
+        if format is None:
+            dateformats = pd.Series(list(d['formats'].values()), index=list(d['formats'].keys()))\
+                .sort_values(ascending=False)
+            dateformat = None
+            if dateformats.idxmax() is not None and dateformats.max().item() > \
+                    (self.n_rows * Constants.PROP_DATES_THRESH.value):
+                dateformat = {'format': dateformats.idxmax(), 'errors': self.n_rows - dateformats.max().item()}
+            format = dateformat['format'] if dateformat is not None else None
+        dates = d['extremes']
+        min = dates.min().strftime(format)
+        max = dates.max().strftime(format)
+        unique_values = ["%s to %s" % (str(min), str(max))]
+        if d['not_dates'].shape[0] <= Constants.FACTOR_THRESH.value:
+            unique_values += d['not_dates'].tolist()
+        else:
+            unique_values.append(self._chars)
+        return {
+            'min': min,
+            'max': max,
+            'n_null': self.n_null,
+            'n_not_null': self.n_not_null,
+            'errors': dateformat['errors'],
+            'type': Constants.SDATE_TYPE.value,
+            'elements': unique_values
+        }
+
+    def _number_report(self):
+        s_numbers = pd.to_numeric(self._number_sample if self._number_sample is not None else \
+            pd.Series(dtype=object))
+        min = s_numbers.min().item()
+        max = s_numbers.max().item()
+        unique_values = ["%s to %s" % (str(min), str(max))]
+        if self._not_numbers.shape[0] <= Constants.FACTOR_THRESH.value:
+            unique_values += self._not_numbers.tolist()
+        else:
+            unique_values.append(self._not_number_chars)
+        return {
+            'min': min,
+            'max': max,
+            'type': Constants.SNUM_TYPE.value,
+            'n_null': self.n_null,
+            'n_not_null': self.n_not_null,
+            'elements': unique_values
+        }
+
+    def _string_report(self):
+        if self.stype == Constants.USER_STEXT.value:
+            return self._text_report()
+        if self.stype == Constants.USER_SDATE.value:
+            return self._text_report() if self._date['failed'] else self._date_report()
+        isnumbers = self.n_not_null > 0 and \
+            (0.00 + self._n_numbers / self.n_not_null) > Constants.PROP_NUMBERS_THRESH.value
+        if self.stype == Constants.USER_SNUM.value or isnumbers:
+            return self._number_report()
+        return self._text_report()
+
+    def report(self):
+        """(returns): the minmax report of all the chunks added so far"""
+        if self._probe is None:
+            raise RuntimeError("Nothing has been added to the profile of column: %s" % self.name)
+        report = {'name': self.name, 'type': Constants.UNKNOWN_TYPE.value, 'n_unique': self.n_unique,
+                    'min': None, 'max': None, 'errors': None, 'elements': None,
+                    }
+        if self.approx:
+            report['n_unique_range'] = self._sketch.estimate()[1:]
+        dtype = self.dtype
+        branch = self._branch(dtype)
+        counts = {'n_null': self.n_null, 'n_not_null': self.n_not_null}
+        if branch == Constants.NUMERIC_TYPE.value:
+            report.update({'type': branch, 'min': self._extremes.min().item(), 'max': self._extremes.max().item(),
+                **counts, 'elements': self._element_summary()})
+        elif branch == Constants.DATE_TYPE.value:
+            report.update({'type': branch, 'min': self._extremes.min().date(), 'max': self._extremes.max().date(),
+                **counts, 'elements': self._element_summary()})
+        elif branch == Constants.TDELTA_TYPE.value:
+            report.update({'type': branch, 'min': self._extremes.min(), 'max': self._extremes.max(),
+                **counts, 'elements': self._element_summary()})
+        elif branch == Constants.CAT_TYPE.value:
+            min, max = _category_extremes(self._extremes)
+            report.update({'min': min, 'max': max, **counts,
+                'type': branch, 'elements': dtype.categories.to_list()})
+        elif branch == Constants.STR_TYPE.value:
+            report.update(self._string_report())
+        else:
+            report.update({'min': self._extremes.min(), 'max': self._extremes.max(), **counts, 'type': dtype})
+        if self._fraction is not None:
+            counts = {'n_rows': self.n_rows, **counts}
+            report['estimates'] = {k: tuple(round(x.item()) for x in estimate_count(n, self._fraction))
+                for k, n in counts.items()}
         return report
@@ -1,58 +1,1195 @@
+import asyncio
+import hashlib
+import io
+import json
+import logging
 import os
 import re
+import threading
+import time
 import warnings
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import date, datetime
+from decimal import Decimal
 from enum import Enum
+from functools import partial
+from pathlib import Path
 
 import pandas as pd
-from dotenv import load_dotenv
-from sqlalchemy import create_engine, inspect
-from sqlalchemy.sql import quoted_name
+from dotenv import dotenv_values, find_dotenv
+from sqlalchemy import (
+    Column,
+    Integer,
+    MetaData,
+    Table,
+    and_,
+    bindparam,
+    cast,
+    create_engine,
+    distinct,
+    event,
+    exists,
+    func,
+    inspect,
+    literal_column,
+    select,
+    tablesample,
+    text,
+)
+from sqlalchemy import column as sql_column
+from sqlalchemy import table as sql_table
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.pool import QueuePool
+from sqlalchemy.sql import quoted_name, sqltypes
+from sqlalchemy.sql.elements import TextClause
 
+from dfeqa import datastructures
+from dfeqa.cache import make_key, query_cache
 from dfeqa.datastructures import DataFrame
 
 engines = {}
 inspectors = {}
+_executors = {}
+_engine_stats = {}
+_engine_lock = threading.RLock()
+
+pool_options = {
+    'pool_size': 5,
+    'max_overflow': 10,
+    'pool_pre_ping': True,
+    'pool_recycle': 3600,
+    'max_concurrent': None,
+    }
+
+env_options = {
+    'watch': False,
+    }
+_env_state = {'loaded': False, 'path': None, 'mtime': None, 'keys': set()}
+
+cache_options = {
+    'enabled': False,
+    'directory': '.dfeqa_cache',
+    'ttl': 24 * 60 * 60,
+    'max_bytes': 2 * 1024 ** 3,
+    }
+
+budget_options = {
+    'max_bytes': None,
+    'action': 'refuse',
+    }
+_budget_actions = ('refuse', 'stream', 'sample')
+
+stats_options = {
+    'enabled': True,
+    'log': None,
+    'max_records': 10000,
+    }
+_query_stats = deque(maxlen=stats_options['max_records'])
+_query_timer = threading.local()
+_stats_lock = threading.Lock()
+
+logger = logging.getLogger(__name__)
 
 class Constants(Enum):
     DEFAULT_CONN = 'DEFAULT_CONN'
+    CHUNKSIZE = 50000 # default rows per chunk when streaming results
+    PARTITIONS = 8 # default number of slices for a partitioned get_table
+    PROFILE_BATCH = 40 # columns profiled in each aggregate query by minmax_sql
+    SAMPLE_MODULUS = 10000 # resolution of the sample fraction when sampling by random number
+    SAMPLE_HASH_PRIME = 1000003 # keys are hashed modulo this prime when sampling by key
+    SAMPLE_HASH_MULTIPLIER = 618036 # about 0.618 of the prime, so consecutive keys are spread evenly
+    STATS_SQL_LENGTH = 200 # characters of each query's sql kept by the query stats
+    STATS_SAMPLE_ROWS = 1000 # rows whose text is sized to estimate the bytes of a result in stats()
+    STRING_BYTES = 57 # memory used by a python string in a dataframe before its characters
+    STRING_LENGTH = 32 # characters assumed for text columns without a declared length
+    WRITE_BATCH = 10000 # default rows in each batch sent by write_table
+    PLAN_BYTES_FACTOR = 3 # memory in a dataframe per byte of row width in a query plan (text is much bigger)
+
+def _env_mtime(path):
+    try:
+        return os.stat(path).st_mtime
+    except OSError:
+        return None
+
+def _load_env(reload=False):
+    """read .env into the environment the first time a connection is needed, and again only
+    when reload is True or watching is on and the file has changed since it was read -
+    variables already set outside .env are left alone"""
+    with _engine_lock:
+        if _env_state['loaded'] and not reload and \
+                (not env_options['watch'] or _env_mtime(_env_state['path']) == _env_state['mtime']):
+            return
+        path = find_dotenv() if reload or not _env_state['loaded'] else _env_state['path']
+        values = {k: v for k, v in (dotenv_values(path) if path else {}).items() if v is not None}
+        for k in _env_state['keys'] - set(values):
+            os.environ.pop(k, None)
+        keys = set()
+        for k, v in values.items():
+            if k in _env_state['keys'] or k not in os.environ:
+                os.environ[k] = v
+                keys.add(k)
+        _env_state.update({'loaded': True, 'path': path, 'mtime': _env_mtime(path) if path else None,
+            'keys': keys})
+
+def configure_env(**kwargs):
+    """set how connection details are read from .env
+        watch: re-read .env whenever its modification time changes (costs one stat per call)
+        (returns): the options now in use"""
+    unknown = set(kwargs) - set(env_options)
+    if unknown:
+        raise KeyError("unknown env option(s): %s" % ", ".join(sorted(unknown)))
+    env_options.update(kwargs)
+    return dict(env_options)
+
+def reload_env():
+    """find and read .env again, eg. after editing connection details during a session"""
+    _load_env(reload=True)
 
 def get_default_conn():
-    load_dotenv()
+    _load_env()
     return os.environ.get(Constants.DEFAULT_CONN.value)
 
-def query(query,conn=None):
+def _resolve_conn(conn=None):
+    """return the connection string for a connection name defined in .env,
+    or conn unchanged if it is already a connection string or engine"""
     if conn is None:
-        conn = get_default_conn()
-    else:
-        load_dotenv()
-        conn = os.environ[conn] if conn in os.environ else conn
-    return DataFrame(pd.read_sql(query, conn))
+        return get_default_conn()
+    _load_env()
+    return os.environ[conn] if isinstance(conn, str) and conn in os.environ else conn
+
+def configure_pool(**kwargs):
+    """set the connection pool options used when engines are created
+        pool_size: connections kept open per database
+        max_overflow: connections allowed above pool_size when busy
+        pool_pre_ping: test each connection before use to drop stale ones
+        pool_recycle: seconds after which a connection is replaced
+        max_concurrent: queries run at once per database by query_many() and the async functions
+            (defaults to pool_size)
+    engines that already exist keep their options until dispose_engines() is called
+        (returns): the pool options now in use"""
+    unknown = set(kwargs) - set(pool_options)
+    if unknown:
+        raise KeyError("unknown pool option(s): %s" % ", ".join(sorted(unknown)))
+    with _engine_lock:
+        pool_options.update(kwargs)
+    return dict(pool_options)
+
+def _engine_kwargs(conn):
+    kwargs = {
+        'echo': False,
+        'future': True,
+        'pool_pre_ping': pool_options['pool_pre_ping'],
+        'pool_recycle': pool_options['pool_recycle'],
+        }
+    url = make_url(conn)
+    # pool sizing only applies to queue pools (not, for example, in-memory sqlite)
+    if issubclass(url.get_dialect().get_pool_class(url), QueuePool):
+        kwargs.update({
+            'pool_size': pool_options['pool_size'],
+            'max_overflow': pool_options['max_overflow'],
+            })
+    return kwargs
+
+def _new_stats():
+    return {'hits': 0, 'misses': 0, 'checkouts': 0, 'checkout_seconds': 0.0}
+
+def get_engine(conn=None):
+    """
+        conn: connection name from .env, connection string or engine of db
+        (returns): the shared engine for conn, created on first use
+    """
+    conn = _resolve_conn(conn)
+    if isinstance(conn, Engine) or not isinstance(conn, str):
+        return conn
+    with _engine_lock:
+        eng = engines.get(conn)
+        if eng is None:
+            eng = create_engine(conn, **_engine_kwargs(conn))
+            engines[conn] = eng
+            _engine_stats.setdefault(eng, _new_stats())['misses'] += 1
+        else:
+            _engine_stats.setdefault(eng, _new_stats())['hits'] += 1
+    return eng
 
-def get_table(tablename, conn=None, schema = "dbo"):
+def get_inspector(conn=None):
+    """
+        conn: connection name from .env, connection string or engine of db
+        (returns): the shared sqlalchemy inspector for conn
+    """
+    eng = get_engine(conn)
+    with _engine_lock:
+        if inspectors.get(eng) is None:
+            inspectors[eng] = inspect(eng)
+        return inspectors[eng]
+
+@contextmanager
+def connect(conn=None):
+    """check a connection out of the shared pool for conn, recording how long it took"""
+    eng = get_engine(conn)
+    if not isinstance(eng, Engine):
+        # already a connection - use it as it is
+        yield eng
+        return
+    start = time.perf_counter()
+    with eng.connect() as connection:
+        elapsed = time.perf_counter() - start
+        with _engine_lock:
+            stats = _engine_stats.setdefault(eng, _new_stats())
+            stats['checkouts'] += 1
+            stats['checkout_seconds'] += elapsed
+        yield connection
+
+def dispose_engines():
+    """close all pooled connections and forget the shared engines"""
+    with _engine_lock:
+        for eng in engines.values():
+            eng.dispose()
+        for ex in _executors.values():
+            ex.shutdown(wait=True)
+        engines.clear()
+        inspectors.clear()
+        _engine_stats.clear()
+        _executors.clear()
+
+def engine_stats():
+    """
+        (returns): dataframe with one row per shared engine showing registry hits and misses,
+            connection checkouts, the time spent waiting for them and the pool status
+    """
+    with _engine_lock:
+        rows = [{
+            'connection': eng.url.render_as_string(hide_password=True),
+            'hits': stats['hits'],
+            'misses': stats['misses'],
+            'checkouts': stats['checkouts'],
+            'checkout_seconds': stats['checkout_seconds'],
+            'mean_checkout_ms': 1000 * stats['checkout_seconds'] / stats['checkouts'] \
+                if stats['checkouts'] else None,
+            'pool_status': eng.pool.status(),
+            } for eng, stats in _engine_stats.items()]
+    return DataFrame(rows, columns=['connection', 'hits', 'misses', 'checkouts', 'checkout_seconds',
+        'mean_checkout_ms', 'pool_status'])
+
+def configure_cache(**kwargs):
+    """set the options for the on-disk cache of query results
+        enabled: cache results of query(), get_table() and load_census() unless they pass cache=False
+        directory: where cached results are stored as parquet files
+        ttl: seconds before a cached result is fetched again
+        max_bytes: total size of the cache before least recently used results are removed
+        (returns): the cache options now in use"""
+    unknown = set(kwargs) - set(cache_options)
+    if unknown:
+        raise KeyError("unknown cache option(s): %s" % ", ".join(sorted(unknown)))
+    cache_options.update(kwargs)
+    return dict(cache_options)
+
+def _get_cache():
+    return query_cache(cache_options['directory'], cache_options['ttl'], cache_options['max_bytes'])
+
+def clear_cache():
+    """remove all cached query results"""
+    _get_cache().clear()
+
+def _conn_id(conn):
+    conn = _resolve_conn(conn)
+    return conn.url.render_as_string(hide_password=False) if hasattr(conn, 'url') else str(conn)
+
+def configure_stats(**kwargs):
+    """set the options for the statistics kept on each query
+        enabled: record each query run by query(), get_table() and load_census()
+        log: (optional) path of a file to append each record to as a line of json
+        max_records: number of records kept in memory for stats()
+        (returns): the stats options now in use"""
+    unknown = set(kwargs) - set(stats_options)
+    if unknown:
+        raise KeyError("unknown stats option(s): %s" % ", ".join(sorted(unknown)))
+    stats_options.update(kwargs)
+    global _query_stats
+    with _stats_lock:
+        if _query_stats.maxlen != stats_options['max_records']:
+            _query_stats = deque(_query_stats, maxlen=stats_options['max_records'])
+    return dict(stats_options)
+
+def stats(clear=False):
+    """
+        clear: forget the records once they have been returned
+        (returns): dataframe with one row per query since the session started (or stats were cleared) -
+            when it started, a fingerprint shared by queries differing only in their literal values, the sql,
+            the connection, seconds to the first row and to the whole result, rows, approximate bytes
+            in memory and whether the result came from the cache ('hit'), was stored in it ('miss' or
+            'refresh') or the cache was off ('off')
+    """
+    with _stats_lock:
+        records = list(_query_stats)
+        if clear:
+            _query_stats.clear()
+    return DataFrame(records, columns=['started', 'fingerprint', 'sql', 'connection', 'first_row_seconds',
+        'fetch_seconds', 'rows', 'bytes', 'cache'])
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _mark_first_row(connection, cursor, statement, parameters, context, executemany):
+    # results are ready to fetch once the cursor has executed
+    timer = getattr(_query_timer, 'current', None)
+    if timer is not None and timer['first_row'] is None:
+        timer['first_row'] = time.perf_counter()
+
+def _fingerprint(sql):
+    """hash of the sql with literal strings, numbers and IN lists replaced, so repeats of a query
+    with different values share a fingerprint"""
+    sql = re.sub(r"'(?:[^']|'')*'", "?", str(sql))
+    sql = re.sub(r"\b\d+(?:\.\d+)?\b", "?", sql)
+    sql = re.sub(r"\(\s*\?(?:\s*,\s*\?)*\s*\)", "(?)", sql)
+    return hashlib.sha1(re.sub(r"\s+", " ", sql).strip().lower().encode('utf-8')).hexdigest()[:16]
+
+def _conn_name(conn):
+    """the .env name of conn, or its url without the password"""
+    if conn is None or isinstance(conn, str) and '://' not in conn:
+        return conn or Constants.DEFAULT_CONN.value
+    url = make_url(conn) if isinstance(conn, str) else getattr(conn, 'url', None)
+    return str(conn) if url is None else url.render_as_string(hide_password=True)
+
+def _approx_bytes(df):
+    """memory used by df, with the text in object columns sized from an evenly spread sample of rows -
+    sizing every string takes seconds on a large result"""
+    columns = [i for i, dtype in enumerate(df.dtypes) if dtype == 'O']
+    if not columns or len(df) <= Constants.STATS_SAMPLE_ROWS.value:
+        return int(df.memory_usage(index=True, deep=True).sum())
+    step = len(df) // Constants.STATS_SAMPLE_ROWS.value
+    text = 0
+    for i in columns:
+        sample = df.iloc[::step, i]
+        text += (sample.memory_usage(index=False, deep=True) - sample.memory_usage(index=False)) * len(df) / len(sample)
+    return int(df.memory_usage(index=True).sum() + text)
+
+def _record_query(sql, conn, started, start, first_row, finished, df, status):
+    record = {
+        'started': started,
+        'fingerprint': _fingerprint(sql),
+        'sql': re.sub(r"\s+", " ", str(sql)).strip()[:Constants.STATS_SQL_LENGTH.value],
+        'connection': _conn_name(conn),
+        'first_row_seconds': None if first_row is None else first_row - start,
+        'fetch_seconds': finished - start,
+        'rows': len(df),
+        'bytes': _approx_bytes(df),
+        'cache': status,
+        }
+    with _stats_lock:
+        _query_stats.append(record)
+        if stats_options['log'] is not None:
+            with open(stats_options['log'], 'a', encoding='utf-8') as f:
+                f.write(json.dumps(record, default=str) + "\n")
+
+def _cached(sql, conn, cache, fetch, params=None, arrow=False):
+    """return fetch() or its cached result, recording the query in stats()
+        cache: None to follow configure_cache(), True or False to use or bypass the cache,
+            or 'refresh' to fetch again and replace any cached result"""
+    if not stats_options['enabled']:
+        return _fetch_cached(sql, conn, cache, fetch, params, arrow)[0]
+    started = pd.Timestamp.now()
+    previous = getattr(_query_timer, 'current', None)
+    _query_timer.current = timer = {'first_row': None}
+    start = time.perf_counter()
+    try:
+        df, status = _fetch_cached(sql, conn, cache, fetch, params, arrow)
+    finally:
+        _query_timer.current = previous
+    _record_query(sql, conn, started, start, timer['first_row'], time.perf_counter(), df, status)
+    return df
+
+def _fetch_cached(sql, conn, cache, fetch, params, arrow):
+    """(returns): (dataframe, 'hit', 'miss', 'refresh' or 'off' for how the cache was used)"""
+    if not (cache_options['enabled'] if cache is None else cache):
+        return fetch(), 'off'
+    store = _get_cache()
+    key = make_key(sql + (" -- arrow" if arrow else ""), _conn_id(conn), params)
+    if cache != 'refresh':
+        df = store.get(key, dtype_backend = 'pyarrow' if arrow else None)
+        if df is not None:
+            return df, 'hit'
+    df = fetch()
+    store.put(key, df, sql = sql)
+    return df, 'refresh' if cache == 'refresh' else 'miss'
+
+def _import_pyarrow():
+    try:
+        import pyarrow
+    except ImportError as e:
+        raise ImportError("arrow=True needs pyarrow - install it with: pip install dfeqa[arrow]") from e
+    return pyarrow
+
+def _arrow_frame(pa, columns, rows):
+    """dataframe backed by arrow dtypes built column by column from python rows"""
+    arrays = []
+    for values in zip(*rows, strict=True) if rows else [[] for _x in columns]:
+        try:
+            arrays.append(pa.array(values))
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            # mixed types in one column - keep them as text
+            arrays.append(pa.array([None if x is None else str(x) for x in values], type=pa.string()))
+    return DataFrame(pa.Table.from_arrays(arrays, names=columns).to_pandas(types_mapper=pd.ArrowDtype))
+
+def _read_arrow(connection, statement, params=None):
+    """fetch statement straight into arrow when the driver's cursor can produce arrow tables
+    (turbodbc, ADBC, databricks), otherwise build the arrow columns from the fetched rows"""
+    pa = _import_pyarrow()
+    result = connection.execute(text(statement) if isinstance(statement, str) else statement, params)
+    try:
+        cursor = result.cursor
+        for method in ['fetchallarrow', 'fetch_arrow_table', 'fetchall_arrow']:
+            if callable(getattr(cursor, method, None)):
+                return DataFrame(getattr(cursor, method)().to_pandas(types_mapper=pd.ArrowDtype))
+        return _arrow_frame(pa, list(result.keys()), result.fetchall())
+    finally:
+        result.close()
+
+def _bound_statement(sql, params):
+    """sql text with :name parameters bound to params - lists, tuples and sets are expanded for IN :name
+        (returns): (statement, params) ready for connection.execute"""
+    if not params:
+        return sql, None
+    params = {k: list(v) if isinstance(v, (list, tuple, set)) else v for k, v in params.items()}
+    statement = text(sql) if isinstance(sql, str) else sql
+    if isinstance(statement, TextClause):
+        statement = statement.bindparams(*[bindparam(k, expanding=True) for k, v in params.items()
+            if isinstance(v, list)])
+    return statement, params
+
+def _read_sql(sql, conn, cache, arrow=False, params=None):
+    statement, params = _bound_statement(sql, params)
+    def fetch():
+        with connect(conn) as connection:
+            return _read_arrow(connection, statement, params) if arrow else \
+                DataFrame(pd.read_sql(statement, connection, params=params))
+    return _cached(sql, conn, cache, fetch, params, arrow)
+
+def configure_budget(**kwargs):
+    """set the memory budget that query() and get_table() check their result against before fetching it
+        max_bytes: estimated size of a result beyond which action is taken, or None for no budget
+        action: 'refuse' to raise RuntimeError, 'stream' to return an iterator of chunks within the budget
+            (as query_iter() does) or 'sample' to fetch a fraction of the rows that fits
+        (returns): the budget options now in use"""
+    unknown = set(kwargs) - set(budget_options)
+    if unknown:
+        raise KeyError("unknown budget option(s): %s" % ", ".join(sorted(unknown)))
+    if kwargs.get('action', budget_options['action']) not in _budget_actions:
+        raise KeyError("budget action must be one of %s" % ", ".join(_budget_actions))
+    budget_options.update(kwargs)
+    return dict(budget_options)
+
+# row counts the database keeps for each table, so they can be read without scanning the table
+_catalog_row_counts = {
+    'mssql': "select sum(p.rows) from sys.partitions p where p.object_id = object_id(:name) and p.index_id in (0, 1)",
+    'postgresql': "select c.reltuples from pg_class c join pg_namespace n on n.oid = c.relnamespace "
+        "where n.nspname = :schema and c.relname = :table",
+    'mysql': "select TABLE_ROWS from INFORMATION_SCHEMA.TABLES where TABLE_SCHEMA = :schema and TABLE_NAME = :table",
+    'mariadb': "select TABLE_ROWS from INFORMATION_SCHEMA.TABLES where TABLE_SCHEMA = :schema and TABLE_NAME = :table",
+    }
+
+def _table_rows(connection, tbl, clauses=()):
+    """rows in a table from the catalog statistics (counted on sqlite), or None if not known - eg. for a view
+        clauses: (optional) where clauses the rows are counted with, which needs sqlite or a query plan"""
+    dialect = connection.dialect.name
+    if dialect == 'sqlite':
+        return connection.execute(select(func.count()).select_from(tbl).where(*clauses)).scalar()
+    if clauses:
+        try:
+            sql = str(select(tbl).where(*clauses).compile(dialect=connection.dialect,
+                compile_kwargs={'literal_binds': True}))
+        except SQLAlchemyError as e:
+            logger.info("no size estimate for filtered table: %s", e)
+            return None
+        return _estimate_query(sql, connection.engine, None)[0]
+    if dialect not in _catalog_row_counts:
+        return None
+    rows = connection.execute(text(_catalog_row_counts[dialect]), {'schema': tbl.schema, 'table': tbl.name,
+        'name': "[%s].[%s]" % (tbl.schema, tbl.name)}).scalar()
+    return None if rows is None or rows < 0 else int(rows)
+
+def _column_bytes(t):
+    """approximate bytes a value of sql type t takes in a dataframe"""
+    if isinstance(t, sqltypes.String):
+        return Constants.STRING_BYTES.value + 8 + min(t.length or Constants.STRING_LENGTH.value, 1000) // 2
+    return 8
+
+def _estimate_table(tbl, conn, columns, where, limit, sample):
+    """(returns): (rows, bytes) estimated for selecting columns from tbl with the where filters, or (None, None)
+    if the row count isn't known - from the catalog statistics without filters, or the query plan with them"""
+    with connect(conn) as connection:
+        rows = _table_rows(connection, tbl, _compile_where(tbl, where))
+    if rows is None:
+        return None, None
+    rows = min(rows, limit) if limit is not None else rows
+    rows = int(rows * sample) if sample is not None else rows
+    cols = tbl.c if columns is None else [_table_column(tbl, c) for c in
+        ([columns] if isinstance(columns, str) else columns)]
+    return rows, rows * sum(_column_bytes(c.type) for c in cols)
+
+def _estimate_query(sql, conn, params):
+    """(returns): (rows, bytes) from the database's plan for sql, or (None, None) if it gives no estimate"""
+    dialect = get_engine(conn).dialect.name
+    try:
+        with connect(conn) as connection:
+            if dialect == 'postgresql':
+                plan = connection.execute(*_bound_statement(text("EXPLAIN (FORMAT JSON) " + sql), params)).scalar()
+                plan = (json.loads(plan) if isinstance(plan, str) else plan)[0]['Plan']
+                rows, width = plan['Plan Rows'], plan['Plan Width']
+            elif dialect == 'mssql' and not params:
+                connection.exec_driver_sql("SET SHOWPLAN_XML ON")
+                try:
+                    plan = connection.exec_driver_sql(sql).scalar()
+                finally:
+                    connection.exec_driver_sql("SET SHOWPLAN_XML OFF")
+                rows = float(re.search(r'EstimateRows="([^"]+)"', plan).group(1))
+                width = int(re.search(r'AvgRowSize="([^"]+)"', plan).group(1))
+            else:
+                return None, None
+    except (SQLAlchemyError, AttributeError, KeyError, ValueError) as e:
+        logger.info("no size estimate for query: %s", e)
+        return None, None
+    return int(rows), int(rows * width * Constants.PLAN_BYTES_FACTOR.value)
+
+def _budget_chunksize(rows, nbytes):
+    """rows in each chunk so that the first chunk, sized before any rows are seen, fits within the budget"""
+    return max(1, min(Constants.CHUNKSIZE.value, int(budget_options['max_bytes'] * max(rows, 1) // max(nbytes, 1))))
+
+def _over_budget(what, rows, nbytes):
+    """the action to take for a result estimated at nbytes, or None to fetch it as normal - logging the decision"""
+    budget = budget_options['max_bytes']
+    if budget is None:
+        return None
+    if nbytes is None:
+        logger.info("%s: size can't be estimated - fetching without a budget check", what)
+        return None
+    if nbytes <= budget:
+        logger.debug("%s: estimated %d bytes for %d rows is within the budget of %d", what, nbytes, rows, budget)
+        return None
+    action = budget_options['action']
+    logger.warning("%s: estimated %d bytes for %d rows is over the budget of %d - %s", what, nbytes, rows, budget,
+        {'refuse': "refusing", 'stream': "streaming in chunks", 'sample': "sampling"}[action])
+    if action == 'refuse':
+        raise RuntimeError("%s is estimated at %d bytes for %d rows, over the memory budget of %d bytes - "
+            "filter it, or use configure_budget(action='stream') or action='sample'" % (what, nbytes, rows, budget))
+    return action
+
+def query(query,conn=None, cache=None, arrow=False, compact=False, params=None):
+    """
+        query: sql string, with :name placeholders for any params
+        conn: connection string or engine of db
+        cache: (optional) True/False to use or bypass the result cache, 'refresh' to update it
+        arrow: fetch into arrow-backed columns (needs pyarrow) which is faster and smaller for wide results
+        compact: True to store columns in the smallest dtypes their values allow (see DataFrame.compact),
+            or a number of values to sample when checking whether text is categorical
+        params: (optional) dict of values for the placeholders, sent to the database separately from the sql
+            so it can reuse one plan - a list of values fills an IN list,
+            eg. query("select * from t where year = :year and ncyear in :ncyears", params={'year': 202324,
+            'ncyears': ['R', '1']})
+        (returns): dataframe containing the query result
+    when configure_budget() sets a budget the database's estimate of the result size is checked first,
+    and a result over the budget is refused, streamed as an iterator of dataframes or sampled
+    """
+    if budget_options['max_bytes'] is not None:
+        rows, nbytes = _estimate_query(query, conn, params)
+        action = _over_budget("query", rows, nbytes)
+        if action is not None:
+            chunks = query_iter(query, conn, _budget_chunksize(rows, nbytes), budget_options['max_bytes'], params)
+        if action == 'stream':
+            return chunks
+        if action == 'sample':
+            # the database can't sample an arbitrary query, so keep a fraction of each chunk as it arrives
+            fraction = budget_options['max_bytes'] / nbytes
+            df = DataFrame(pd.concat([x.sample(frac=fraction) for x in chunks], ignore_index=True))
+            df.attrs['sample'] = {'fraction': fraction, 'method': 'client'}
+            return df
+    df = _read_sql(query, conn, cache, arrow, params)
+    return df if compact is False else df.compact(sample = None if compact is True else compact)
+
+def _partition_filters(connection, col, partitions, whereclause=None):
+    """where clauses that between them select every row exactly once - ranges between the min and max of
+    a numeric or date column, otherwise groups of its distinct values - plus one for nulls"""
+    bounds_query = select(func.min(col), func.max(col))
+    values_query = select(col).where(col.is_not(None)).distinct().order_by(col)
+    if whereclause is not None:
+        bounds_query, values_query = bounds_query.where(whereclause), values_query.where(whereclause)
+    lo, hi = connection.execute(bounds_query).one()
+    filters = []
+    if lo is not None:
+        try:
+            rangeable = issubclass(col.type.python_type, (int, float, Decimal, date)) and lo != hi
+        except NotImplementedError:
+            rangeable = False
+        if rangeable:
+            bounds = [lo + ((hi - lo) * i // partitions if isinstance(lo, int) else (hi - lo) * i / partitions)
+                for i in range(partitions)] + [hi]
+            filters = [and_(col >= bounds[i], col < bounds[i + 1]) for i in range(partitions - 1)] \
+                + [and_(col >= bounds[-2], col <= hi)]
+        else:
+            values = connection.execute(values_query).scalars().all()
+            size = -(-len(values) // partitions)
+            filters = [col.in_(values[i:i + size]) for i in range(0, len(values), size)]
+    return filters + [col.is_(None)]
+
+_where_operators = {
+    '=': lambda col, v: col == v,
+    '!=': lambda col, v: col != v,
+    '<': lambda col, v: col < v,
+    '<=': lambda col, v: col <= v,
+    '>': lambda col, v: col > v,
+    '>=': lambda col, v: col >= v,
+    'in': lambda col, v: col.in_(list(v)),
+    'not in': lambda col, v: col.not_in(list(v)),
+    'like': lambda col, v: col.like(v),
+    }
+
+def _table_clause(tablename, conn, schema):
+    """sqlalchemy table built from the table_meta column list, so names can be checked without reflection"""
+    meta = table_meta("%s.%s" % (schema, tablename), conn)
+    return meta, sql_table(meta.tablename, *[sql_column(c['name'], c['type']) for c in meta.columns],
+        schema = meta.schema)
+
+def _table_column(tbl, name):
+    if name not in tbl.c:
+        raise KeyError("column %s not in %s" % (name, tbl.name))
+    return tbl.c[name]
+
+def _where_list(where):
+    """structured filters as a list of (column, operator, value)"""
+    if where is None:
+        return []
+    if isinstance(where, dict):
+        return [(k, 'in' if isinstance(v, (list, tuple, set)) else '=', v) for k, v in where.items()]
+    return list(where)
+
+def _compile_where(tbl, where):
+    """turn structured filters into sqlalchemy clauses with bound parameters
+        where: dict of {column: value} (a list, tuple or set of values means IN, None means IS NULL)
+            or list of (column, operator, value) with operator one of =, !=, <, <=, >, >=, in, not in, like"""
+    clauses = []
+    for name, op, value in _where_list(where):
+        if op.lower() not in _where_operators:
+            raise KeyError("unsupported operator in where: %s" % op)
+        clauses.append(_where_operators[op.lower()](_table_column(tbl, name), value))
+    return clauses
+
+def _table_select(tbl, columns, where, limit):
+    cols = [tbl] if columns is None else [_table_column(tbl, c) for c in
+        ([columns] if isinstance(columns, str) else columns)]
+    stmt = select(*cols).where(*_compile_where(tbl, where))
+    return stmt if limit is None else stmt.limit(limit)
+
+def _get_table_partitioned(tbl, meta, conn, stmt, partition_by, partitions, workers, arrow):
+    col = _table_column(tbl, partition_by)
+    with connect(conn) as connection:
+        filters = _partition_filters(connection, col, partitions, stmt.whereclause)
+    pk = (meta.pk_constr or {}).get('constrained_columns') or []
+    order = [col] + [tbl.c[c] for c in pk if c != partition_by]
+
+    def fetch(where):
+        with connect(conn) as connection:
+            return connection.execute(stmt.where(where).order_by(*order)).fetchall()
+
+    with ThreadPoolExecutor(max_workers = workers or pool_options['max_concurrent'] or pool_options['pool_size'],
+            thread_name_prefix = 'dfeqa-partition') as ex:
+        slices = list(ex.map(fetch, filters))
+    # build one frame from all the rows so dtypes are inferred as they would be for a single fetch
+    columns = [c.name for c in stmt.selected_columns]
+    rows = [row for rows in slices for row in rows]
+    return _arrow_frame(_import_pyarrow(), columns, rows) if arrow else \
+        DataFrame.from_records(rows, columns=columns, coerce_float=True)
+
+_tablesample_dialects = ('mssql', 'postgresql')
+
+def _sample_method(conn, key=None):
+    """every nth block of keys when key is given, otherwise TABLESAMPLE where the database has it,
+    otherwise a random number per row"""
+    if key is not None:
+        return 'modulo'
+    return 'tablesample' if get_engine(conn).dialect.name in _tablesample_dialects else 'random'
+
+def _sample_source(tbl, conn, fraction, key=None):
+    """(returns): what to select from to sample a fraction of the rows of tbl and the filters that take the sample"""
+    if not 0 < fraction <= 1:
+        raise RuntimeError("sample must be a fraction of the table between 0 and 1")
+    m = Constants.SAMPLE_MODULUS.value
+    if key is not None:
+        # multiplicative hash of the key, so a sample isn't a block of ids (and so of years or terms)
+        p, a = Constants.SAMPLE_HASH_PRIME.value, Constants.SAMPLE_HASH_MULTIPLIER.value
+        hashed = cast(func.abs(_table_column(tbl, key)), sqltypes.BigInteger) % p * a % p
+        return tbl, [hashed < int(round(fraction * p))]
+    dialect = get_engine(conn).dialect.name
+    if dialect == 'mssql':
+        return tablesample(tbl, func.system(literal_column('%r PERCENT' % (100 * fraction))), name='sampled'), []
+    if dialect == 'postgresql':
+        return tablesample(tbl, func.bernoulli(100 * fraction), name='sampled'), []
+    if dialect == 'sqlite':
+        return tbl, [func.abs(func.random()) % m < int(round(fraction * m))]
+    return tbl, [func.rand() < fraction]
+
+def get_table(tablename, conn=None, schema = "dbo", columns=None, where=None, limit=None, cache=None,
+        partition_by=None, partitions=Constants.PARTITIONS.value, workers=None, arrow=False, compact=False,
+        sample=None, sample_key=None):
     """
         tablename:
         conn: connection string or engine of db
         schema: defaults to dbo
+        columns: (optional) list of columns to fetch instead of all of them
+        where: (optional) filters applied on the server, either a dict of {column: value}
+            (a list of values means IN, None means IS NULL) or a list of (column, operator, value)
+            with operator one of =, !=, <, <=, >, >=, in, not in, like
+        limit: (optional) maximum number of rows to fetch
+        cache: (optional) True/False to use or bypass the result cache, 'refresh' to update it
+        partition_by: (optional) column to split the table on so slices are fetched in parallel -
+            an integer key or date is split into ranges, other columns (eg. CensusTerm) by their values
+        partitions: number of slices to split the table into
+        workers: number of slices fetched at once (defaults to max_concurrent or pool_size)
+        arrow: fetch into arrow-backed columns (needs pyarrow) which is faster and smaller for wide tables
+        compact: True to store columns in the smallest dtypes the table_meta column types allow
+            (see DataFrame.compact), or a number of values to sample when checking whether text is categorical
+        sample: (optional) fraction of the rows to fetch, eg. 0.01 for a quick draft of a report -
+            minmax() and fd() then add estimates for the whole table with confidence intervals
+        sample_key: (optional) integer column to sample on, for the same sample every time - the key is
+            hashed so sequential ids are sampled evenly rather than in blocks
         (returns): dataframe containing target table
+            (ordered by partition_by and the primary key when partitioned)
+    column names are checked against table_meta, raising KeyError if they aren't in the table
+    when configure_budget() sets a budget the size is estimated first from the row count (from the catalog,
+    or the query plan when there is a where) and the column types, and a table over the budget is refused,
+    streamed as an iterator of dataframes or sampled - one whose size can't be estimated is fetched as normal
     """
-    if conn is None:
-        conn = get_default_conn()
+    if budget_options['max_bytes'] is not None:
+        _meta, tbl = _table_clause(tablename, conn, schema)
+        rows, nbytes = _estimate_table(tbl, conn, columns, where, limit, sample)
+        action = _over_budget("get_table %s.%s" % (schema, tablename), rows, nbytes)
+        if action == 'stream':
+            return query_iter(_table_select(tbl, columns, where, limit), conn, _budget_chunksize(rows, nbytes),
+                budget_options['max_bytes'])
+        if action == 'sample':
+            sample = (sample or 1) * budget_options['max_bytes'] / nbytes
+    df = _fetch_table(tablename, conn, schema, columns, where, limit, cache, partition_by, partitions, workers,
+        arrow, sample, sample_key)
+    if compact is not False:
+        df = df.compact(types = _column_kinds(table_meta("%s.%s" % (schema, tablename), conn)),
+            sample = None if compact is True else compact)
+    if sample is not None:
+        # a fresh frame so columns already looked at (eg. by stats) pick up the label too
+        df = df.copy(deep=False)
+        df.attrs['sample'] = {'fraction': sample, 'method': _sample_method(conn, sample_key)}
+    return df
+
+def _column_kinds(meta):
+    """kind of data in each column as used by DataFrame.compact, from the table_meta column types"""
+    kinds = {}
+    for c in meta.columns or []:
+        t = c['type']
+        kinds[c['name']] = 'boolean' if isinstance(t, sqltypes.Boolean) else \
+            'integer' if isinstance(t, sqltypes.Integer) else \
+            'date' if isinstance(t, (sqltypes.Date, sqltypes.DateTime)) else \
+            'string' if isinstance(t, sqltypes.String) else None
+    return kinds
+
+def _fetch_table(tablename, conn, schema, columns, where, limit, cache, partition_by, partitions, workers, arrow,
+        sample, sample_key):
+    if columns is None and where is None and limit is None and partition_by is None and not arrow \
+            and sample is None:
+        def fetch():
+            with connect(conn) as connection:
+                return DataFrame(pd.read_sql_table(tablename, schema = schema, con = connection))
+        return _cached("table:%s.%s" % (schema, tablename), conn, cache, fetch)
+
+    meta, tbl = _table_clause(tablename, conn, schema)
+    src, sample_filters = (tbl, []) if sample is None else _sample_source(tbl, conn, sample, sample_key)
+    stmt = _table_select(src, columns, where, limit).where(*sample_filters)
+    params = stmt.compile().params
+    if partition_by is not None:
+        if limit is not None:
+            raise RuntimeError("limit can't be combined with partition_by")
+        return _cached("%s -- partition_by %s/%d" % (stmt, partition_by, partitions), conn, cache,
+            partial(_get_table_partitioned, src, meta, conn, stmt, partition_by, partitions, workers, arrow),
+            params, arrow)
+
+    def fetch_selection():
+        with connect(conn) as connection:
+            return _read_arrow(connection, stmt) if arrow else DataFrame(pd.read_sql(stmt, connection))
+    return _cached(str(stmt), conn, cache, fetch_selection, params, arrow)
+
+def _executor(conn):
+    """the shared thread pool that runs concurrent queries against conn,
+    sized to cap the number of queries running at once on that database"""
+    key = _conn_id(conn)
+    with _engine_lock:
+        if key not in _executors:
+            _executors[key] = ThreadPoolExecutor(
+                max_workers = pool_options['max_concurrent'] or pool_options['pool_size'],
+                thread_name_prefix = 'dfeqa-db')
+        return _executors[key]
+
+def query_many(queries, conn=None, cache=None, params=None):
+    """run several queries at once, each on its own pooled connection
+        queries: list of sql strings, or of (sql, conn) or (sql, conn, params) tuples to query different databases
+            or pass each query its own parameters
+        conn: connection string or engine of db for queries without their own
+        cache: (optional) True/False to use or bypass the result cache, 'refresh' to update it
+        params: (optional) list of parameter dicts to run one sql string once for each,
+            eg. query_many("select ... where AcademicYear = :year", params=[{'year': y} for y in years])
+        (returns): list of dataframes in the same order as queries"""
+    if params is not None:
+        queries = [(queries, conn, p) for p in params]
+    futures = []
+    for q in queries:
+        sql, q_conn, q_params = (q + (None,))[:3] if isinstance(q, tuple) else (q, conn, None)
+        futures.append(_executor(q_conn).submit(query, sql, q_conn, cache, params=q_params))
+    return [f.result() for f in futures]
+
+async def query_async(sql, conn=None, cache=None, params=None, **kwargs):
+    """awaitable version of query(), run on the shared thread pool for conn
+    eg. current, previous = await asyncio.gather(query_async(sql1), query_async(sql2))"""
+    return await asyncio.get_running_loop().run_in_executor(_executor(conn),
+        partial(query, sql, conn, cache, params=params, **kwargs))
+
+async def get_table_async(tablename, conn=None, schema = "dbo", **kwargs):
+    """awaitable version of get_table(), run on the shared thread pool for conn"""
+    return await asyncio.get_running_loop().run_in_executor(_executor(conn),
+        partial(get_table, tablename, conn, schema, **kwargs))
+
+def _iter_chunks(connection, statement, chunksize, max_bytes, params=None):
+    """fetch the result of statement through a server-side cursor in dataframes of at most chunksize rows,
+    shrinking the chunks when max_bytes is given so each one stays within roughly that many bytes"""
+    result = connection.execution_options(stream_results=True).execute(statement, params)
+    columns = list(result.keys())
+    n_rows = chunksize
+    try:
+        while True:
+            rows = result.fetchmany(n_rows)
+            if not rows:
+                break
+            chunk = DataFrame.from_records(rows, columns=columns, coerce_float=True)
+            if max_bytes is not None:
+                bytes_per_row = chunk.memory_usage(index=False, deep=True).sum() / chunk.shape[0]
+                n_rows = max(1, min(chunksize, int(max_bytes // max(bytes_per_row, 1))))
+            yield chunk
+    finally:
+        result.close()
+
+def query_iter(query, conn=None, chunksize=Constants.CHUNKSIZE.value, max_bytes=None, params=None):
+    """
+        query: sql string or sqlalchemy selectable
+        conn: connection string or engine of db
+        chunksize: maximum number of rows in each chunk
+        max_bytes: (optional) approximate memory budget for each chunk
+        params: (optional) dict of values for :name placeholders in query, as for query()
+        (yields): dataframes containing successive chunks of the query result
+    the pooled connection is held until the generator is exhausted or closed
+    """
+    statement, params = _bound_statement(text(query) if isinstance(query, str) else query, params)
+    with connect(conn) as connection:
+        yield from _iter_chunks(connection, statement, chunksize, max_bytes, params)
+
+def get_table_iter(tablename, conn=None, schema = "dbo", chunksize=Constants.CHUNKSIZE.value, max_bytes=None):
+    """
+        tablename:
+        conn: connection string or engine of db
+        schema: defaults to dbo
+        chunksize: maximum number of rows in each chunk
+        max_bytes: (optional) approximate memory budget for each chunk
+        (yields): dataframes containing successive chunks of the target table
+    """
+    with connect(conn) as connection:
+        table = Table(tablename, MetaData(), schema = schema, autoload_with = connection)
+        yield from _iter_chunks(connection, select(table), chunksize, max_bytes)
+
+_incremental_lock = threading.Lock()
+
+def _incremental_paths(directory, conn, schema, tablename):
+    directory = Path(cache_options['directory']) / 'incremental' if directory is None else Path(directory)
+    return directory / (make_key('incremental', _conn_id(conn), [schema, tablename]) + '.parquet'), \
+        directory / 'state.json'
+
+def _encode_watermark(value):
+    """json-safe form of a high-water mark - rowversions are bytes, timestamps are datetimes"""
+    if isinstance(value, bytes):
+        return {'type': 'bytes', 'value': value.hex()}
+    if isinstance(value, (datetime, pd.Timestamp)):
+        return {'type': 'datetime', 'value': pd.Timestamp(value).isoformat()}
+    if isinstance(value, date):
+        return {'type': 'date', 'value': value.isoformat()}
+    return {'type': 'value', 'value': value.item() if hasattr(value, 'item') else value}
+
+def _decode_watermark(mark):
+    if mark['type'] == 'bytes':
+        return bytes.fromhex(mark['value'])
+    if mark['type'] == 'datetime':
+        return pd.Timestamp(mark['value']).to_pydatetime()
+    if mark['type'] == 'date':
+        return date.fromisoformat(mark['value'])
+    return mark['value']
+
+def _read_state(path):
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def get_table_incremental(tablename, conn=None, schema = "dbo", watermark=None, key=None, columns=None, where=None,
+        refresh=False, directory=None):
+    """keep a local parquet copy of a table up to date by fetching only the rows added or changed since the last load
+        tablename:
+        conn: connection string or engine of db
+        schema: defaults to dbo
+        watermark: column that increases whenever a row is added or changed - a rowversion,
+            a last modified timestamp or an identity key
+        key: (optional) column, or list of columns, identifying a row so changed rows replace their old version -
+            defaults to the primary key, and without one new rows are appended
+        columns: (optional) list of columns to keep (watermark and key are always fetched)
+        where: (optional) filters, as for get_table()
+        refresh: fetch the whole table again and start a new copy
+        directory: (optional) where the copies and the state file with each table's high-water mark are kept,
+            defaults to 'incremental' under the cache directory
+        (returns): dataframe containing the whole copy, with the rows fetched and the high-water mark
+            in .attrs['incremental']
+    rows deleted from the table stay in the copy until refresh=True, and configure_budget() doesn't apply"""
+    if watermark is None:
+        raise RuntimeError("get_table_incremental needs a watermark column")
+    if key is None:
+        key = (table_meta("%s.%s" % (schema, tablename), conn).pk_constr or {}).get('constrained_columns') or []
+    key = [key] if isinstance(key, str) else list(key)
+    if columns is not None:
+        columns = list(dict.fromkeys(([columns] if isinstance(columns, str) else list(columns)) + key + [watermark]))
+    snapshot_path, state_path = _incremental_paths(directory, conn, schema, tablename)
+    # state is keyed on the snapshot's hash so the connection url (and any password in it) isn't written out
+    source = snapshot_path.stem
+    with _incremental_lock:
+        entry = None if refresh or not snapshot_path.exists() else _read_state(state_path).get(source)
+        filters = _where_list(where)
+        if entry is not None and entry['watermark'] is not None:
+            filters.append((watermark, '>', _decode_watermark(entry['watermark'])))
+        # fetched around the memory budget, as a sample or stream of the new rows can't be merged into the copy
+        new = _fetch_table(tablename, conn, schema, columns=columns, where=filters, limit=None, cache=False,
+            partition_by=None, partitions=None, workers=None, arrow=False, sample=None, sample_key=None)
+        if entry is None:
+            df = new
+        else:
+            df = DataFrame(pd.read_parquet(snapshot_path))
+            if len(new):
+                if key:
+                    df = df[~df.set_index(key).index.isin(new.set_index(key).index)]
+                df = DataFrame(pd.concat([df, new], ignore_index=True))
+        mark = _encode_watermark(new[watermark].max()) if len(new) else None if entry is None else entry['watermark']
+        if entry is None or len(new):
+            snapshot_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = snapshot_path.with_name(snapshot_path.name + '.tmp')
+            df.to_parquet(tmp_path, index=False)
+            os.replace(tmp_path, snapshot_path)
+        state = _read_state(state_path)
+        state[source] = {'table': "%s.%s" % (schema, tablename), 'connection': _conn_name(conn), 'watermark': mark,
+            'snapshot': snapshot_path.name, 'rows': len(df), 'loaded': time.time()}
+        with open(state_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f, indent=2)
+    df.attrs['incremental'] = {'rows_fetched': len(new), 'rows': len(df),
+        'watermark': None if mark is None else _decode_watermark(mark)}
+    return df
+
+def _quoted(connection, schema, tablename):
+    prep = connection.dialect.identifier_preparer
+    return "%s.%s" % (prep.quote_schema(schema), prep.quote(tablename)) if schema else prep.quote(tablename)
+
+def _python_rows(df):
+    """rows of df as tuples of python values, with nulls as None"""
+    return list(df.astype(object).where(df.notna(), None).itertuples(index=False, name=None))
+
+def _bulk_insert(connection, table, df, chunksize):
+    """insert df into a sqlalchemy table in batches by the fastest route the driver offers -
+    COPY for psycopg2, fast_executemany for pyodbc, otherwise executemany, which sqlalchemy turns into
+    multi-row VALUES where the dialect allows it
+        (returns): the route used"""
+    prep = connection.dialect.identifier_preparer
+    target = _quoted(connection, table.schema, table.name)
+    columns = ", ".join(prep.quote(str(c)) for c in df.columns)
+    cursor = connection.connection.driver_connection.cursor()
+    try:
+        if callable(getattr(cursor, 'copy_expert', None)):
+            for i in range(0, len(df), chunksize):
+                buf = io.StringIO()
+                df.iloc[i:i + chunksize].to_csv(buf, index=False, header=False)
+                buf.seek(0)
+                cursor.copy_expert("COPY %s (%s) FROM STDIN WITH CSV" % (target, columns), buf)
+            return 'copy'
+        if hasattr(cursor, 'fast_executemany'):
+            cursor.fast_executemany = True
+            sql = "INSERT INTO %s (%s) VALUES (%s)" % (target, columns, ", ".join(["?"] * len(df.columns)))
+            for i in range(0, len(df), chunksize):
+                cursor.executemany(sql, _python_rows(df.iloc[i:i + chunksize]))
+            return 'fast_executemany'
+    finally:
+        cursor.close()
+    # through the table's column types so values like timestamps are converted for the driver
+    for i in range(0, len(df), chunksize):
+        connection.execute(table.insert(), [dict(zip(df.columns, row, strict=True)) for row in
+            _python_rows(df.iloc[i:i + chunksize])])
+    return 'executemany'
+
+def _rename_table(connection, schema, old, new):
+    if connection.dialect.name == 'mssql':
+        connection.execute(text("EXEC sp_rename :old, :new"), {'old': "%s.%s" % (schema, old), 'new': new})
+    elif connection.dialect.name in ('mysql', 'mariadb'):
+        connection.exec_driver_sql("RENAME TABLE %s TO %s" % (_quoted(connection, schema, old),
+            _quoted(connection, schema, new)))
+    else:
+        connection.exec_driver_sql("ALTER TABLE %s RENAME TO %s" % (_quoted(connection, schema, old),
+            connection.dialect.identifier_preparer.quote(new)))
+
+def write_table(df, tablename, conn=None, schema = "dbo", if_exists='fail', chunksize=Constants.WRITE_BATCH.value):
+    """write a dataframe to a database table in bulk, eg. validation exceptions or frequency summaries for a dashboard
+        df: dataframe to write (the index is not written)
+        tablename:
+        conn: connection string or engine of db
+        schema: defaults to dbo
+        if_exists: 'fail' to raise RuntimeError if the table exists, 'replace' to swap it for the new rows,
+            or 'append' to add the new rows to it
+        chunksize: rows sent to the database in each batch
+        (returns): dict of the table, rows written, seconds taken, rows per second and the insert route used
+    the rows are loaded into a staging table first, which then replaces the table (or is copied into it) -
+    on SQL Server and PostgreSQL in one transaction and on MySQL in one RENAME TABLE, so readers never see
+    a half-written table; other databases (eg. SQLite) may briefly have no table between the drop and rename"""
+    if if_exists not in ('fail', 'replace', 'append'):
+        raise KeyError("if_exists must be one of fail, replace, append")
+    start = time.perf_counter()
+    eng = get_engine(conn)
+    staging = "%s_staging_%s" % (tablename, os.urandom(4).hex())
+    with connect(eng) as connection:
+        with connection.begin():
+            table_exists = inspect(connection).has_table(tablename, schema=schema)
+            if table_exists and if_exists == 'fail':
+                raise RuntimeError("table %s.%s already exists - use if_exists='replace' or 'append'" % (
+                    schema, tablename))
+            # pandas chooses the column types - appended rows are converted to the table's types on the way in
+            df.head(0).to_sql(staging, connection, schema=schema, index=False)
+        try:
+            with connection.begin():
+                method = _bulk_insert(connection,
+                    Table(staging, MetaData(), schema = schema, autoload_with = connection), df, chunksize)
+            with connection.begin():
+                if table_exists and if_exists == 'append':
+                    columns = ", ".join(connection.dialect.identifier_preparer.quote(str(c)) for c in df.columns)
+                    connection.exec_driver_sql("INSERT INTO %s (%s) SELECT %s FROM %s" % (
+                        _quoted(connection, schema, tablename), columns, columns,
+                        _quoted(connection, schema, staging)))
+                    connection.exec_driver_sql("DROP TABLE %s" % _quoted(connection, schema, staging))
+                elif table_exists and connection.dialect.name in ('mysql', 'mariadb'):
+                    # DDL commits implicitly on mysql, but one RENAME TABLE swaps both names atomically
+                    retired = "%s_old_%s" % (tablename, os.urandom(4).hex())
+                    connection.exec_driver_sql("RENAME TABLE %s TO %s, %s TO %s" % (
+                        _quoted(connection, schema, tablename), _quoted(connection, schema, retired),
+                        _quoted(connection, schema, staging), _quoted(connection, schema, tablename)))
+                    connection.exec_driver_sql("DROP TABLE %s" % _quoted(connection, schema, retired))
+                else:
+                    if table_exists:
+                        connection.exec_driver_sql("DROP TABLE %s" % _quoted(connection, schema, tablename))
+                    _rename_table(connection, schema, staging, tablename)
+        except Exception:
+            with connection.begin():
+                connection.exec_driver_sql("DROP TABLE IF EXISTS %s" % _quoted(connection, schema, staging))
+            raise
+    with _engine_lock:
+        inspectors.pop(eng, None)
+    seconds = time.perf_counter() - start
+    report = {'table': "%s.%s" % (schema, tablename), 'rows': len(df), 'seconds': seconds,
+        'rows_per_second': len(df) / seconds if seconds else None, 'method': method}
+    logger.info("write_table %s: %d rows in %.2fs (%s)", report['table'], len(df), seconds, method)
+    return report
+
+def _sql_type(values):
+    """sqlalchemy type to hold a column of values in a temporary table"""
+    if pd.api.types.is_bool_dtype(values):
+        return sqltypes.Boolean()
+    if pd.api.types.is_integer_dtype(values):
+        return sqltypes.BigInteger()
+    if pd.api.types.is_float_dtype(values):
+        return sqltypes.Float()
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return sqltypes.DateTime()
+    # a declared length so the column can be indexed and compared cheaply
+    return sqltypes.String(max(1, int(values.astype(str).str.len().max() if len(values) else 1)))
+
+def match_keys(keys, tablename, conn=None, schema = "dbo", on=None, columns=None, where=None, how='matched',
+        chunksize=Constants.WRITE_BATCH.value):
+    """check a local set of keys against a table on the server, eg. which of the UPNs in a file are in census,
+    by uploading them to a temporary table and joining there so only the answer is downloaded
+        keys: series or dataframe of key values
+        tablename:
+        conn: connection string or engine of db
+        schema: defaults to dbo
+        on: (optional) column, or list of columns, of the table matching the columns of keys - defaults to
+            the names of keys
+        columns: (optional) list of columns of the table to return for matched rows
+        where: (optional) filters on the table, as for get_table()
+        how: 'matched' for the rows of the table whose key is in keys, or 'unmatched' for the keys that
+            aren't in the table
+        chunksize: rows sent to the database in each batch
+        (returns): dataframe of the matched table rows or the unmatched keys"""
+    if how not in ('matched', 'unmatched'):
+        raise KeyError("how must be matched or unmatched")
+    keys = (keys.to_frame() if isinstance(keys, pd.Series) else keys).dropna().drop_duplicates()
+    on = list(keys.columns) if on is None else [on] if isinstance(on, str) else list(on)
+    if len(on) != len(keys.columns):
+        raise KeyError("on needs a column of %s for each column of keys" % tablename)
+    # unnamed keys (eg. a series read from a file) take the name of the table column they match
+    keys = keys.set_axis([c if isinstance(c, str) else o for c, o in zip(keys.columns, on, strict=True)], axis=1)
+    _meta, tbl = _table_clause(tablename, conn, schema)
+    table_cols = [_table_column(tbl, c) for c in on]
+    eng = get_engine(conn)
+    # temporary tables are private to the connection and named with # on SQL Server
+    name = "%sdfeqa_keys_%s" % ('#' if eng.dialect.name == 'mssql' else '', os.urandom(4).hex())
+    tmp = Table(name, MetaData(), *[Column(c, _sql_type(keys[c])) for c in keys.columns],
+        prefixes = [] if eng.dialect.name == 'mssql' else ['TEMPORARY'])
+    joined = and_(*[k == c for k, c in zip(tmp.c, table_cols, strict=True)])
+    if how == 'matched':
+        stmt = _table_select(tbl, columns, where, None).where(exists().where(joined))
     else:
-        load_dotenv()
-        conn = os.environ[conn] if conn in os.environ else conn
-    return DataFrame(pd.read_sql_table(tablename, schema = schema, con = conn))
+        stmt = select(tmp).where(~exists().where(joined, *_compile_where(tbl, where)))
+    with connect(eng) as connection:
+        with connection.begin():
+            tmp.create(connection)
+            try:
+                _bulk_insert(connection, tmp, keys, chunksize)
+                return DataFrame(pd.read_sql(stmt, connection))
+            finally:
+                tmp.drop(connection)
+
+# dialects where the whole catalog can be read from INFORMATION_SCHEMA in one query
+_information_schema_dialects = ('mssql', 'postgresql', 'mysql', 'mariadb')
+
+# system schemas the inspector leaves out, skipped when listing the whole catalog
+_system_schemas = {
+    'postgresql': "%(col)s not like 'pg\\_%%' and %(col)s <> 'information_schema'",
+}
+
+def _user_schemas(eng, col):
+    """sql condition on col excluding the dialect's system schemas, or None"""
+    condition = _system_schemas.get(eng.dialect.name)
+    return None if condition is None else condition % {'col': col}
+
+def _catalog_tables(eng, schema, table_type):
+    """(schema, name) for all tables or views in one INFORMATION_SCHEMA query"""
+    sql = "select TABLE_SCHEMA, TABLE_NAME from INFORMATION_SCHEMA.TABLES where TABLE_TYPE = :table_type"
+    if schema is not None:
+        sql += " and TABLE_SCHEMA = :schema"
+    elif _user_schemas(eng, 'TABLE_SCHEMA') is not None:
+        sql += " and " + _user_schemas(eng, 'TABLE_SCHEMA')
+    with connect(eng) as connection:
+        return [tuple(x) for x in connection.execute(text(sql + " order by TABLE_SCHEMA, TABLE_NAME"),
+            {'table_type': table_type, 'schema': schema})]
 
 def list_tables(conn = None, schema = None):
     """
         conn: connection string or engine to database
         schema: (optional) schema to filter results by
         (returns): list of table names in target db"""
-    if conn is None:
-        conn = get_default_conn()
-    else:
-        load_dotenv()
-        conn = os.environ[conn] if conn in os.environ else conn
-    eng = create_engine(conn, echo=False, future=True)
+    eng = get_engine(conn)
+    if eng.dialect.name in _information_schema_dialects:
+        return _catalog_tables(eng, schema, 'BASE TABLE')
     i = inspect(eng)
     list_of_tablenames = []
     schemanames = i.get_schema_names()
@@ -68,12 +1205,9 @@ def list_views(conn = None, schema = None):
         conn: connection string or engine to database
         schema: (optional) schema to filter results by
         (returns): list of view names in target db"""
-    if conn is None:
-        conn = get_default_conn()
-    else:
-        load_dotenv()
-        conn = os.environ[conn] if conn in os.environ else conn
-    eng = create_engine(conn, echo=False, future=True)
+    eng = get_engine(conn)
+    if eng.dialect.name in _information_schema_dialects:
+        return _catalog_tables(eng, schema, 'VIEW')
     i = inspect(eng)
     list_of_viewnames = []
     schemanames = i.get_schema_names()
@@ -84,29 +1218,93 @@ def list_views(conn = None, schema = None):
             list_of_viewnames.append((s,v))
     return list_of_viewnames
 
-def load_census(year, term=None, NCYear=None, columns=None, conn='DEFAULT_CONN'):
+_reflected_columns = ['schema', 'tablename', 'table_type', 'column', 'ordinal', 'type', 'max_length',
+    'precision', 'scale', 'nullable']
+_reflected_dtypes = {'ordinal': 'int64', 'max_length': 'Int64', 'precision': 'Int64', 'scale': 'Int64',
+    'nullable': 'bool'}
+
+def _reflect_information_schema(eng, schema):
+    sql = """select c.TABLE_SCHEMA, c.TABLE_NAME,
+            case when t.TABLE_TYPE = 'VIEW' then 'view' else 'table' end,
+            c.COLUMN_NAME, c.ORDINAL_POSITION, c.DATA_TYPE, c.CHARACTER_MAXIMUM_LENGTH,
+            c.NUMERIC_PRECISION, c.NUMERIC_SCALE,
+            case when c.IS_NULLABLE = 'YES' then 1 else 0 end
+        from INFORMATION_SCHEMA.COLUMNS c
+        join INFORMATION_SCHEMA.TABLES t
+            on t.TABLE_CATALOG = c.TABLE_CATALOG and t.TABLE_SCHEMA = c.TABLE_SCHEMA
+            and t.TABLE_NAME = c.TABLE_NAME"""
+    if schema is not None:
+        sql += " where c.TABLE_SCHEMA = :schema"
+    elif _user_schemas(eng, 'c.TABLE_SCHEMA') is not None:
+        sql += " where " + _user_schemas(eng, 'c.TABLE_SCHEMA')
+    with connect(eng) as connection:
+        rows = connection.execute(text(sql + " order by 1, 2, 5"), {'schema': schema}).fetchall()
+    return [tuple(x[:-1]) + (bool(x[-1]),) for x in rows]
+
+def _reflect_metadata(eng, schema):
+    i = inspect(eng)
+    rows = []
+    for s in [schema] if schema is not None else i.get_schema_names():
+        views = set(i.get_view_names(schema=s))
+        md = MetaData()
+        md.reflect(bind=eng, schema=s, views=True)
+        for tbl in sorted(md.tables.values(), key=lambda x: x.name):
+            for n, col in enumerate(tbl.columns, 1):
+                try:
+                    type_name = str(col.type).split('(')[0].lower()
+                except Exception:
+                    type_name = None
+                rows.append((s, tbl.name, 'view' if tbl.name in views else 'table', col.name, n, type_name,
+                    getattr(col.type, 'length', None), getattr(col.type, 'precision', None),
+                    getattr(col.type, 'scale', None), bool(col.nullable)))
+    return rows
+
+def _metadata_snapshot_path(conn, schema):
+    return Path(cache_options['directory']) / 'metadata' / (make_key('metadata', _conn_id(conn), schema) + '.json')
+
+def reflect_schema(conn = None, schema = None, refresh = False):
+    """describe every column of every table and view in a database (or one schema) in a few catalog queries
+        conn: connection string or engine to database
+        schema: (optional) schema to limit the results to
+        refresh: re-read the catalog instead of using a saved snapshot
+        (returns): dataframe with one row per column - schema, tablename, table_type, column, ordinal,
+            type, max_length, precision, scale and nullable
+    the result is saved as a snapshot under the cache directory and reused by later sessions
+    until refresh=True or invalidate_metadata() is used"""
+    path = _metadata_snapshot_path(conn, schema)
+    if not refresh and path.exists():
+        return DataFrame(pd.read_json(path, orient='split', dtype=False).astype(_reflected_dtypes))
+    eng = get_engine(conn)
+    rows = _reflect_information_schema(eng, schema) if eng.dialect.name in _information_schema_dialects \
+        else _reflect_metadata(eng, schema)
+    df = DataFrame(rows, columns=_reflected_columns).astype(_reflected_dtypes)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    df.to_json(path, orient='split', index=False)
+    return df
+
+def invalidate_metadata(conn = None, schema = None):
+    """remove the saved metadata snapshot for a database (or one schema of it),
+    or all snapshots if conn is 'all'"""
+    paths = (Path(cache_options['directory']) / 'metadata').glob('*.json') if conn == 'all' \
+        else [_metadata_snapshot_path(conn, schema)]
+    for path in paths:
+        path.unlink(missing_ok=True)
+
+def load_census(year, term=None, NCYear=None, columns=None, conn='DEFAULT_CONN', cache=None):
     """to load a census dataset from PDR
     pass the year to load data from
     optionally pass the term in that year (or don't to get all terms)
     and also optionally, pass the year group NCYear,
     or a list of year groups, or don't specify to get all year groups
     and an optional list of columns to reduce the size of the query
-    and resulting dataframe"""
+    and resulting dataframe
+    cache=True/False uses or bypasses the result cache, cache='refresh' updates it"""
 
     warnings.warn("""load_census() is deprecated and will be removed in a future release.
     It's a convenience function for DfE users, but it doesn't add functionality not available
     in get_table() or query().""", DeprecationWarning, stacklevel=2)
 
-    load_dotenv()
-    db_conn = os.environ[conn] if conn in os.environ else conn
-
-    # check what is in ncyear - list or string?
-    ncyear_list = list()
-    if isinstance(NCYear, str):
-        ncyear_list.append(NCYear)
-    elif isinstance(NCYear, list):
-        ncyear_list = NCYear
-    # build sql query
+    # build sql query with bound parameters, so the server reuses one plan whatever the year, term and year groups
     query = "select "
     if columns:
         assert isinstance(columns, (str, list))
@@ -117,56 +1315,51 @@ def load_census(year, term=None, NCYear=None, columns=None, conn='DEFAULT_CONN')
     else:
         query += "*"
     query += """ from {tablename}
-    where AcademicYear = {acadyr}""".format(tablename = 'tier0.CensusSeasonSSA_MasterView',
-        acadyr = year)
+    where AcademicYear = :acadyr""".format(tablename = 'tier0.CensusSeasonSSA_MasterView')
+    params = {'acadyr': year}
     if term:
-        query += " and CensusTerm = '{term}'".format(term = term)
+        query += " and CensusTerm = :term"
+        params['term'] = term
     if NCYear:
-        query += " and NCYearActual IN ({ncyear})""".format(ncyear = "'" + "','".join(ncyear_list) + "'")
+        query += " and NCYearActual IN :ncyear"
+        params['ncyear'] = [NCYear] if isinstance(NCYear, str) else list(NCYear)
     # query the db
-    return DataFrame(pd.read_sql(query, db_conn))
+    return _read_sql(query, conn, cache, params=params)
 
 class table_meta():
+    """metadata for a table - each facet (columns, constraints, etc.) is fetched from the
+    database the first time it's used and then kept"""
+    _facet_names = ['columns', 'constraints', 'foreign_keys', 'indexes', 'pk_constr', 'uniq_constr',
+        'table_comment']
+
     def __init__(self, tablename, conn = Constants.DEFAULT_CONN.value):
         self._tablename = None
         self._schema = None
-        self._columns = None
-        self._constraints = None
-        self._foreign_keys = None
-        self._indexes = None
-        self._pk_constr = None
-        self._uniq_constr = None
-        self._table_comment = None
-        load_dotenv()
-        conn = os.environ.get(conn) if conn in os.environ else conn
-        if not engines.get(conn):
-            engines[conn] = create_engine(conn, echo=False, future=True)
-        if not inspectors.get(conn):
-            inspectors[conn] = inspect(engines[conn])
-        self._insp = inspectors[conn]
+        self._facets = {}
+        self._conn = conn
+        self._insp = get_inspector(conn)
 
         schema_tablename = self._process_tablename(tablename)
         self._schema = schema_tablename[0]
         self._tablename = schema_tablename[1]
-        self._columns = self._get_columns()
-        self._constraints = self._get_constraints()
-        self._foreign_keys = self._get_foreign_keys()
-        self._indexes = self._get_indexes()
-        self._pk_constr = self._get_pk_constr()
-        self._uniq_constr = self._get_uniq_constr()
-        self._table_comment = self._get_table_comment()
+
+    def _facet(self, name, insp=None):
+        if name not in self._facets:
+            self._facets[name] = getattr(self, '_get_' + name)(insp or self._insp)
+        return self._facets[name]
 
     def as_dict(self):
+        missing = [x for x in self._facet_names if x not in self._facets]
+        if missing:
+            # fetch whatever hasn't been used yet over a single connection
+            with connect(self._conn) as connection:
+                insp = inspect(connection)
+                for name in missing:
+                    self._facet(name, insp)
         return {
             'schema': self._schema,
             'tablename': self._tablename,
-            'columns': self._columns,
-            'constraints': self._constraints,
-            'foreign_keys': self._foreign_keys,
-            'indexes': self._indexes,
-            'pk_constr': self._pk_constr,
-            'uniq_constr': self._uniq_constr,
-            'table_comment': self._table_comment
+            **{name: self._facets[name] for name in self._facet_names}
             }
 
     @property
@@ -194,11 +1387,11 @@ class table_meta():
 
     @property
     def columns(self):
-        return self._columns
+        return self._facet('columns')
 
-    def _get_columns(self):
+    def _get_columns(self, insp):
         try:
-            cols = self._insp.get_columns(table_name = self._tablename, schema = self._schema)
+            cols = insp.get_columns(table_name = self._tablename, schema = self._schema)
         except NotImplementedError:
             cols = None
         else:
@@ -208,33 +1401,33 @@ class table_meta():
 
     @property
     def constraints(self):
-        return self._constraints
+        return self._facet('constraints')
 
-    def _get_constraints(self):
+    def _get_constraints(self, insp):
         try:
-            constr = self._insp.get_check_constraints(table_name = self._tablename, schema = self._schema)
+            constr = insp.get_check_constraints(table_name = self._tablename, schema = self._schema)
         except NotImplementedError:
             constr = None
         return constr
 
     @property
     def foreign_keys(self):
-        return self._foreign_keys
+        return self._facet('foreign_keys')
 
-    def _get_foreign_keys(self):
+    def _get_foreign_keys(self, insp):
         try:
-            fks = self._insp.get_foreign_keys(table_name = self._tablename, schema = self._schema)
+            fks = insp.get_foreign_keys(table_name = self._tablename, schema = self._schema)
         except NotImplementedError:
             fks = None
         return fks
 
     @property
     def indexes(self):
-        return self._indexes
+        return self._facet('indexes')
 
-    def _get_indexes(self):
+    def _get_indexes(self, insp):
         try:
-            indx = self._insp.get_indexes(table_name = self._tablename, schema = self._schema)
+            indx = insp.get_indexes(table_name = self._tablename, schema = self._schema)
             indxs=[]
             for _x in indx:
                 indxs.extend([_x['name'], _x])
@@ -244,33 +1437,33 @@ class table_meta():
 
     @property
     def pk_constr(self):
-        return self._pk_constr
+        return self._facet('pk_constr')
 
-    def _get_pk_constr(self):
+    def _get_pk_constr(self, insp):
         try:
-            pk_constr = self._insp.get_pk_constraint(table_name = self._tablename, schema = self._schema)
+            pk_constr = insp.get_pk_constraint(table_name = self._tablename, schema = self._schema)
         except NotImplementedError:
             pk_constr = None
         return pk_constr
 
     @property
     def uniq_constr(self):
-        return self._uniq_constr
+        return self._facet('uniq_constr')
 
-    def _get_uniq_constr(self):
+    def _get_uniq_constr(self, insp):
         try:
-            uniq_constr = self._insp.get_unique_constraints(table_name = self._tablename, schema = self._schema)
+            uniq_constr = insp.get_unique_constraints(table_name = self._tablename, schema = self._schema)
         except NotImplementedError:
             uniq_constr = None
         return uniq_constr
 
     @property
     def table_comment(self):
-        return self._table_comment
+        return self._facet('table_comment')
 
-    def _get_table_comment(self):
+    def _get_table_comment(self, insp):
         try:
-            tab_comment = self._insp.get_table_comment(table_name = self._tablename, schema = self._schema)['text']
+            tab_comment = insp.get_table_comment(table_name = self._tablename, schema = self._schema)['text']
         except NotImplementedError:
             tab_comment = None
         return tab_comment
@@ -280,3 +1473,95 @@ def get_table_metadata(tablename, conn = Constants.DEFAULT_CONN.value):
     function to get the metadata for a given SQL table
     """
     return table_meta(tablename = tablename, conn = conn).as_dict()
+
+def _profile_aggregates(col, i):
+    """aggregates describing one column, labelled with its position in the batch"""
+    value = cast(col, Integer) if isinstance(col.type, sqltypes.Boolean) else col # MIN(bit) fails on SQL Server
+    aggs = [func.count(col).label('n%d' % i), func.count(distinct(col)).label('u%d' % i)]
+    if not isinstance(col.type, sqltypes.LargeBinary):
+        aggs += [func.min(value).label('min%d' % i), func.max(value).label('max%d' % i)]
+    if isinstance(col.type, sqltypes.String):
+        aggs += [func.min(func.length(col)).label('minlen%d' % i), func.max(func.length(col)).label('maxlen%d' % i)]
+    return aggs
+
+def _top_values(connection, tbl, filters, col, n):
+    """the n most frequent values of col"""
+    return connection.execute(select(col).where(*filters, col.is_not(None)).group_by(col)
+        .order_by(func.count().desc(), col).limit(n)).scalars().all()
+
+def _profile_report(connection, tbl, filters, col, row, i, top_n):
+    """report in the same form as Series.minmax from the aggregates for one column"""
+    ds = datastructures.Constants
+    n_not_null = row['n%d' % i]
+    n_unique = row['u%d' % i]
+    report = {'name': col.name, 'type': str(col.type), 'n_unique': n_unique,
+        'min': row.get('min%d' % i), 'max': row.get('max%d' % i), 'errors': None, 'elements': None,
+        'n_null': row['n_rows'] - n_not_null, 'n_not_null': n_not_null}
+    top = _top_values(connection, tbl, filters, col, top_n) if top_n else []
+    if isinstance(col.type, sqltypes.String):
+        # lengths as Series.minmax counts them, with nulls as empty strings
+        report.update({'type': ds.STR_TYPE.value,
+            'min': 0 if report['n_null'] else row['minlen%d' % i],
+            'max': row['maxlen%d' % i] or 0})
+        if n_unique <= ds.FACTOR_THRESH.value:
+            report['elements'] = connection.execute(select(col).where(*filters, col.is_not(None)).distinct()
+                .order_by(col)).scalars().all() + ([''] if report['n_null'] else [])
+        elif top:
+            report['elements'] = top + ['...']
+    elif isinstance(col.type, (sqltypes.Numeric, sqltypes.Integer, sqltypes.Date, sqltypes.DateTime)):
+        if isinstance(col.type, (sqltypes.Date, sqltypes.DateTime)):
+            report.update({'type': ds.DATE_TYPE.value,
+                'min': report['min'].date() if hasattr(report['min'], 'date') else report['min'],
+                'max': report['max'].date() if hasattr(report['max'], 'date') else report['max']})
+        else:
+            report['type'] = ds.NUMERIC_TYPE.value
+        report['elements'] = ["({0:d} unique values)".format(n_unique)] + top \
+            + (['...'] if top and n_unique > len(top) else [])
+    return report
+
+def sql_source(source, columns, conn=None, schema = "dbo", where=None):
+    """something to select columns from for a table name or sql query, eg. to count them in the database
+        source: table name (optionally schema.table) or sql query
+        columns: list of the columns that will be selected, checked against table_meta for a table
+        conn: connection string or engine of db
+        schema: defaults to dbo
+        where: (optional) filters on a table, as for get_table()
+        (returns): sqlalchemy selectable and a list of the where clauses for it"""
+    if re.match(r"\s*(select|with)\b", source, flags=re.IGNORECASE):
+        if where is not None:
+            raise RuntimeError("where can only be used with a table - add it to the query instead")
+        return text(source).columns(*[sql_column(c) for c in columns]).subquery('q'), []
+    names = source.split(".")
+    _meta, tbl = _table_clause(names[-1], conn, names[0] if len(names) == 2 else schema)
+    for c in columns:
+        _table_column(tbl, c)
+    return tbl, _compile_where(tbl, where)
+
+def minmax_sql(tablename, conn=None, schema = "dbo", columns=None, where=None, top_n=None):
+    """summarise the columns of a table like DataFrame.minmax() but with aggregate queries in the database,
+    so the table is never downloaded
+        tablename:
+        conn: connection string or engine of db
+        schema: defaults to dbo
+        columns: (optional) list of columns to profile instead of all of them
+        where: (optional) filters applied on the server, as for get_table()
+        top_n: (optional) number of most frequent values to list in elements
+            (text columns with few unique values always list them, in value order)
+        (returns): dataframe with one row per column - name, type, n_unique, min, max, errors, elements,
+            n_null and n_not_null - with min and max the shortest and longest lengths for text
+    the table_meta column types decide which aggregates are used"""
+    meta, tbl = _table_clause(tablename, conn, schema)
+    names = [c['name'] for c in meta.columns] if columns is None else \
+        [columns] if isinstance(columns, str) else list(columns)
+    cols = [_table_column(tbl, n) for n in names]
+    filters = _compile_where(tbl, where)
+    reports = []
+    with connect(conn) as connection:
+        for start in range(0, len(cols), Constants.PROFILE_BATCH.value):
+            batch = cols[start:start + Constants.PROFILE_BATCH.value]
+            aggs = [func.count().label('n_rows')] + [x for i, col in enumerate(batch)
+                for x in _profile_aggregates(col, i)]
+            row = connection.execute(select(*aggs).select_from(tbl).where(*filters)).one()._mapping
+            reports.extend(_profile_report(connection, tbl, filters, col, row, i, top_n)
+                for i, col in enumerate(batch))
+    return DataFrame(reports)
@@ -7,8 +7,10 @@ import pandas as pd
 import regex
 import seaborn as sns
 from matplotlib.ticker import MaxNLocator
+from sqlalchemy import func, select, tuple_
 
-from .datastructures import DataFrame
+from .datastructures import DataFrame, estimate_count
+from .db import connect, get_engine, sql_source
 
 _pat1 = regex.compile(r'\{\{([^\{\}\|]*)\}\}')
 _pat3 = regex.compile(r'{{((?:[^<>={}!]|{{(?1)}})+)'
@@ -17,6 +19,9 @@ _pat3 = regex.compile(r'{{((?:[^<>={}!]|{{(?1)}})+)'
                         r'((?:[^{}|]++|{(?!{)|}(?!})|(?<=\\)\||{{(?4)}}|(?0))*)\|'
                         r'((?:[^{}]++|{(?!{)|}(?=})|{{(?5)}}|(?0))*)}}')
 
+# dialects that can count several columns in one pass with GROUP BY GROUPING SETS
+_grouping_sets_dialects = ('mssql', 'postgresql', 'oracle')
+
 class Constants(Enum):
     SERIES_LABEL = "series"
 
@@ -50,6 +55,16 @@ class summary():
                 for lbl,x in self._data.items()]
         return _summaries
 
+    @classmethod
+    def from_counts(cls, counts, names=None):
+        """summary of frequency counts that have already been calculated (eg. in the database)
+            counts: list of (label, series of counts indexed by value)"""
+        obj = cls.__new__(cls)
+        obj._data = None
+        obj._summaries = [(k, x.rename_axis(None)) for (k, x) in counts]
+        obj._names = names
+        return obj
+
     def set_names(self, names):
         self._names = names
         return self
@@ -95,13 +110,19 @@ def fd(
     cols: list = None,
     ids: list = None,
     long=False,
-    value_columnname=None
+    value_columnname=None,
+    sample_fraction=None
     ):
     """frequency distributions - provide a dataframe with cols to create frequencies from or
     a list of Pandas Series
     return long-form summary of freqency distribution of specified columns
-    optional ids provides labels for groups in returned data"""
+    optional ids provides labels for groups in returned data
+    optional sample_fraction (taken from data fetched with get_table(sample=...)) adds estimated counts
+    for the whole table with 95% confidence intervals - <group>_est, _lower and _upper columns, or
+    estimate, lower and upper when long"""
 
+    if sample_fraction is None and isinstance(data, pd.DataFrame|pd.Series) and 'sample' in data.attrs:
+        sample_fraction = data.attrs['sample']['fraction']
     if cols:
         data = data[cols]
     if isinstance(data, pd.Series) and ids is None:
@@ -110,6 +131,69 @@ def fd(
         returndata = summary(data).set_names(ids).long_fd()
     else:
         returndata = summary(data).set_names(ids).wide_fd()
+    if sample_fraction is not None:
+        returndata = _add_estimates(returndata, sample_fraction, long)
+    if value_columnname:
+        returndata = returndata.rename(columns = {'value': value_columnname})
+    return returndata
+
+def _add_estimates(df, fraction, long):
+    """add whole-table estimates and confidence limits for each count in a frequency distribution of a sample"""
+    groups = ['count'] if long else [c for c in df.columns if c != 'value']
+    for g in groups:
+        names = ('estimate', 'lower', 'upper') if long else ("%s_est" % g, "%s_lower" % g, "%s_upper" % g)
+        for name, x in zip(names, estimate_count(df[g], fraction), strict=True):
+            df[name] = x.round().astype(int)
+    return df
+
+def fd_sql(
+    source: str,
+    cols: str|list,
+    conn = None,
+    by: str = None,
+    ids: list = None,
+    long=False,
+    value_columnname=None,
+    schema="dbo",
+    where=None,
+    dropna=True
+    ):
+    """frequency distributions counted in the database with GROUP BY, so only the counts are transferred
+    source: table name or sql query
+    cols: column, or list of columns, to count the values of
+    by: (optional) column to split each distribution by, eg. AcademicYear to compare years
+    where: (optional) filters on a table, as for get_table()
+    dropna: leave out counts of nulls, as fd() does
+    return the same layout as fd() so the result can go straight to barchart()"""
+    cols = [cols] if isinstance(cols, str) else list(cols)
+    src, filters = sql_source(source, cols + ([by] if by else []), conn, schema, where)
+    group = [src.c[by]] if by else []
+    counts = {}
+    if get_engine(conn).dialect.name in _grouping_sets_dialects and len(cols) > 1:
+        # one pass over the table for all the columns
+        stmt = select(*group, *[src.c[c] for c in cols], *[func.grouping(src.c[c]) for c in cols],
+            func.count().label('n')).where(*filters)\
+            .group_by(func.grouping_sets(*[tuple_(*group, src.c[c]) for c in cols]))
+        with connect(conn) as connection:
+            for row in connection.execute(stmt):
+                i = list(row[len(group) + len(cols):-1]).index(0)
+                counts.setdefault((cols[i], row[0] if by else None), {})[row[len(group) + i]] = row[-1]
+    else:
+        with connect(conn) as connection:
+            for c in cols:
+                stmt = select(*group, src.c[c], func.count().label('n')).where(*filters)\
+                    .group_by(*group, src.c[c])
+                for row in connection.execute(stmt):
+                    counts.setdefault((c, row[0] if by else None), {})[row[-2]] = row[-1]
+    keys = [(c, None) for c in cols] if not by else \
+        sorted(counts, key=lambda k: (cols.index(k[0]), k[1] is None, k[1]))
+    summaries = []
+    for c, b in keys:
+        freqs = {k: v for k, v in counts.get((c, b), {}).items() if not (dropna and k is None)}
+        label = c if not by else str(b) if len(cols) == 1 else "%s_%s" % (c, b)
+        summaries.append((label, pd.Series(freqs, dtype=int, name=label)))
+    s = summary.from_counts(summaries).set_names(ids)
+    returndata = s.long_fd() if long else s.wide_fd()
     if value_columnname:
         returndata = returndata.rename(columns = {'value': value_columnname})
     return returndata
@@ -87,3 +87,17 @@ def List_of_Dates_as_Strings():
         for y in range(2000,2002)
         for m in range(1,13)
         for d in range(1,29)]
+
+@pytest.fixture
+def Sqlite_Conn(tmp_path):
+    conn = "sqlite:///%s" % (tmp_path / "census.db")
+    pd.DataFrame({
+        'PupilMatchingRefAnonymous': range(1, 101),
+        'AcademicYear': [202324] * 50 + [202425] * 50,
+        'CensusTerm': ['Autumn', 'Spring'] * 50,
+        'NCYearActual': [str(x % 7) if x % 7 else 'R' for x in range(100)],
+        'forename': ['Name%s' % (x % 13) for x in range(100)],
+        }).to_sql('census', conn, index=False)
+    yield conn
+    from dfeqa.db import dispose_engines
+    dispose_engines()
@@ -1,8 +1,9 @@
 from datetime import date, datetime
+from decimal import Decimal
 
 import pandas as pd
 
-from dfeqa.datastructures import Constants, Series
+from dfeqa.datastructures import ColumnProfile, Constants, DataFrame, Series, hyperloglog
 
 
 def test_minmax_strings(List_Of_Series):
@@ -446,3 +447,98 @@ def test_minmax_mixture_of_types(List_of_Dates_as_Strings):
 
 
 
+
+def test_minmax_text_worked_out_from_unique_values():
+    s = Series(['bb', None, 'a', 'bb', 1, '1', pd.NA], name='mixed')
+    assert s.minmax(stype='text') == {'name': 'mixed', 'type': Constants.STR_TYPE.value, 'n_unique': 4,
+        'min': 0, 'max': 2, 'errors': None, 'elements': ['bb', '', 'a', '1'], 'n_null': 2, 'n_not_null': 5}
+    # a single repeated value that isn't a date still falls back to text, as when each row is parsed
+    assert Series(['x1', 'x1']).minmax(stype='date')['type'] == Constants.STR_TYPE.value
+
+def test_minmax_text_keeps_equal_values_that_read_differently():
+    assert Series([1, 1.0, 'a']).minmax(stype='text')['elements'] == ['1', '1.0', 'a']
+    assert Series([1, 1.0, 'a']).minmax(stype='text')['max'] == 3
+    assert Series([True, 1, 'x']).minmax(stype='text')['elements'] == ['True', '1', 'x']
+    assert Series([Decimal('1.50'), Decimal('1.5'), 'q']).minmax(stype='text')['elements'] == ['1.50', '1.5', 'q']
+    # rows of 1 are numbers even though they equal the True before them
+    s = Series([True, 1, 2, 1.0, 'x', 3] * 5, name='mixed')
+    expected = {'name': 'mixed', 'type': Constants.SNUM_TYPE.value, 'n_unique': 4, 'min': 1, 'max': 3,
+        'errors': None, 'elements': ['1 to 3', True, 'x'], 'n_null': 0, 'n_not_null': 30}
+    assert s.minmax() == expected
+    profile = ColumnProfile()
+    for start in range(0, s.shape[0], 7):
+        profile.update(s[start:start + 7])
+    assert profile.report() == expected
+
+def test_minmax_dataframe_in_parallel():
+    df = DataFrame({
+        'ncyear': [1, 2, None, 6] * 25,
+        'dob': pd.to_datetime(['2015-01-01', '2016-02-02', None, '2017-03-03'] * 25),
+        'forename': ['Anna', 'Zoë', None, 'Bob'] * 25,
+        })
+    expected = df.minmax(forename={'stype': 'text'})
+    for backend in ('thread', 'process'):
+        assert df.minmax(workers=2, backend=backend, forename={'stype': 'text'}).equals(expected)
+
+def test_column_profile_matches_minmax(List_Of_Series):
+    columns = [
+        (Series(List_Of_Series[0], name='forename'), {}),
+        (Series(List_Of_Series[0], name='forename'), {'stype': 'text'}),
+        (Series([str(x) for x in range(300)] + ['x', None] * 10, name='numbers'), {}),
+        (Series(['01/02/2020', None, '15/03/2021', '20/11/2019'] * 25 + ['x'], name='dates'),
+            {'stype': 'date', 'dayfirst': True}),
+        (Series([x / 4 for x in range(200)], name='floats'), {}),
+        ]
+    for s, kwargs in columns:
+        profile = ColumnProfile(**kwargs)
+        for start in range(0, s.shape[0], 37):
+            profile.update(s[start:start + 37])
+        assert profile.report() == s.minmax(**kwargs)
+        first, second = ColumnProfile(**kwargs).update(s[:50]), ColumnProfile(**kwargs).update(s[50:])
+        assert first.merge(second).report() == s.minmax(**kwargs)
+
+def test_minmax_dataframe_in_chunks():
+    df = DataFrame({'ncyear': [1, 2, None, 6] * 25, 'forename': ['Anna', 'Zoë', None, 'Bob'] * 25})
+    assert df.minmax(workers=2, chunksize=30).equals(df.minmax())
+
+def test_minmax_approx_unique():
+    s = Series(range(20000), name='id')
+    report = s.minmax(n_unique='approx')
+    assert report['n_unique_range'][0] <= 20000 <= report['n_unique_range'][1]
+    assert report['elements'][0] == '(~%d unique values)' % report['n_unique']
+    profile = ColumnProfile(n_unique='approx')
+    for start in range(0, 20000, 3000):
+        profile.update(s[start:start + 3000])
+    assert profile.report() == report
+
+def test_minmax_approx_unique_text():
+    s = Series(["A%012d" % x for x in range(3000)] + [None, 'x'], name='upn')
+    exact, approx = s.minmax(), s.minmax(n_unique='approx')
+    assert approx['n_unique_range'][0] <= 3001 <= approx['n_unique_range'][1]
+    assert {k: v for k, v in approx.items() if k not in ('n_unique', 'n_unique_range')} == \
+        {k: v for k, v in exact.items() if k != 'n_unique'}
+
+def test_hyperloglog_merge():
+    whole = hyperloglog(10).update(['a%d' % x for x in range(5000)])
+    merged = hyperloglog(10).update(['a%d' % x for x in range(3000)]).merge(
+        hyperloglog(10).update(['a%d' % x for x in range(2000, 5000)]))
+    assert (merged.registers == whole.registers).all()
+    assert hyperloglog(10).update([1, '1', None]).estimate()[0] == 2
+
+def test_compact_dataframe():
+    df = DataFrame({
+        'term': ['Autumn', 'Spring', 'Summer', 'Autumn'] * 25,
+        'ncyear': [1, 2, None, 6] * 25,
+        'flag': [True, False, True, None] * 25,
+        'dob': [date(2015, 1, 1), date(2016, 2, 2), None, date(2017, 3, 3)] * 25,
+        'upn': ["A%012d" % x for x in range(100)],
+        })
+    compacted = df.compact()
+    assert [str(x) for x in compacted.dtypes] == ['category', 'Int8', 'boolean', 'datetime64[ns]', 'object']
+    assert compacted['ncyear'].tolist()[:3] == [1, 2, pd.NA]
+    assert compacted.attrs['compact']['bytes_saved'] > 0
+    assert compacted.attrs['compact']['bytes_after'] < df.memory_usage(index=False, deep=True).sum()
+
+def test_compact_series_with_kind():
+    assert Series(['1', '2', '300']).compact(kind='integer').dtype == 'Int16'
+    assert Series([1.5, 2.0]).compact().dtype == 'float64'
@@ -0,0 +1,454 @@
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+import pytest
+from dotenv import dotenv_values
+from sqlalchemy import create_mock_engine, event
+
+from dfeqa import db
+from dfeqa.cache import make_key
+from dfeqa.datastructures import DataFrame
+from dfeqa.db import (
+    configure_budget,
+    configure_cache,
+    configure_env,
+    configure_pool,
+    configure_stats,
+    engine_stats,
+    get_engine,
+    get_table,
+    get_table_async,
+    get_table_incremental,
+    get_table_iter,
+    invalidate_metadata,
+    list_tables,
+    match_keys,
+    minmax_sql,
+    query,
+    query_async,
+    query_iter,
+    query_many,
+    reflect_schema,
+    stats,
+    table_meta,
+    write_table,
+)
+from dfeqa.summaries import fd
+
+
+def test_query_from_sqlite(Sqlite_Conn):
+    df = query("select * from census where CensusTerm = 'Autumn'", Sqlite_Conn)
+    assert df.shape == (50, 5)
+
+def test_get_table_from_sqlite(Sqlite_Conn):
+    assert get_table('census', Sqlite_Conn, schema='main').shape == (100, 5)
+
+def test_engine_is_shared_between_functions(Sqlite_Conn):
+    query("select 1 as x", Sqlite_Conn)
+    get_table('census', Sqlite_Conn, schema='main')
+    list_tables(Sqlite_Conn)
+    table_meta('main.census', Sqlite_Conn)
+    stats = engine_stats()
+    assert stats.shape[0] == 1
+    assert stats.loc[0, 'misses'] == 1
+    assert stats.loc[0, 'hits'] == 3
+    assert stats.loc[0, 'checkouts'] == 2
+
+def test_engine_registry_is_thread_safe(Sqlite_Conn):
+    with ThreadPoolExecutor(8) as ex:
+        engs = list(ex.map(lambda _x: get_engine(Sqlite_Conn), range(32)))
+    assert all(e is engs[0] for e in engs)
+    assert engine_stats().loc[0, 'misses'] == 1
+
+def test_configure_pool_rejects_unknown_options():
+    with pytest.raises(KeyError):
+        configure_pool(pool_sise=3)
+
+def test_query_iter_yields_chunks(Sqlite_Conn):
+    chunks = list(query_iter("select * from census", Sqlite_Conn, chunksize=30))
+    assert [c.shape[0] for c in chunks] == [30, 30, 30, 10]
+    assert all(isinstance(c, DataFrame) for c in chunks)
+    assert chunks[-1]['PupilMatchingRefAnonymous'].tolist() == list(range(91, 101))
+
+def test_get_table_iter_with_byte_budget(Sqlite_Conn):
+    chunks = list(get_table_iter('census', Sqlite_Conn, schema='main', chunksize=40, max_bytes=2000))
+    assert sum(c.shape[0] for c in chunks) == 100
+    assert all(c.shape[0] < 40 for c in chunks[1:])
+
+@pytest.fixture
+def Cache(tmp_path):
+    options = dict(db.cache_options)
+    configure_cache(directory=tmp_path / "cache")
+    yield db._get_cache()
+    db.cache_options.update(options)
+
+def test_query_cache_reuses_result(Sqlite_Conn, Cache):
+    sql = "select * from census where CensusTerm = 'Spring'"
+    first = query(sql, Sqlite_Conn, cache=True)
+    with get_engine(Sqlite_Conn).begin() as c:
+        c.exec_driver_sql("delete from census")
+    assert query("  select *\n from census where CensusTerm = 'Spring'", Sqlite_Conn, cache=True).equals(first)
+    assert query(sql, Sqlite_Conn).shape[0] == 0
+    assert query(sql, Sqlite_Conn, cache='refresh').shape[0] == 0
+    assert query(sql, Sqlite_Conn, cache=True).shape[0] == 0
+
+def test_query_cache_expires_entries(Sqlite_Conn, Cache):
+    configure_cache(ttl=0)
+    query("select 1 as x", Sqlite_Conn, cache=True)
+    assert db._get_cache().entries() == []
+
+def test_query_cache_evicts_least_recently_used(Sqlite_Conn, Cache):
+    query("select 1 as x", Sqlite_Conn, cache=True)
+    query("select 2 as x", Sqlite_Conn, cache=True)
+    first, second = (make_key(sql, Sqlite_Conn) for sql in ["select 1 as x", "select 2 as x"])
+    for key in [first, second]:
+        os.utime(Cache.directory / (key + ".parquet"), (0, 0))
+    query("select 1 as x", Sqlite_Conn, cache=True)
+    configure_cache(max_bytes=sum(size for _k, size, _u in Cache.entries()) - 1)
+    db._get_cache().evict()
+    assert [k for k, _s, _u in Cache.entries()] == [first]
+
+def test_query_many_returns_results_in_order(Sqlite_Conn):
+    results = query_many(["select %d as x" % i for i in range(10)], Sqlite_Conn)
+    assert [r.loc[0, 'x'] for r in results] == list(range(10))
+
+def test_query_many_caps_concurrency_per_connection(Sqlite_Conn, monkeypatch):
+    configure_pool(max_concurrent=2)
+    running, peak, lock = [0], [0], threading.Lock()
+    def slow_query(sql, conn, cache, params=None):
+        with lock:
+            running[0] += 1
+            peak[0] = max(peak[0], running[0])
+        time.sleep(0.05)
+        with lock:
+            running[0] -= 1
+        return sql
+    monkeypatch.setattr(db, 'query', slow_query)
+    try:
+        assert query_many(["q%d" % i for i in range(6)], Sqlite_Conn) == ["q%d" % i for i in range(6)]
+    finally:
+        configure_pool(max_concurrent=None)
+    assert peak[0] == 2
+
+def test_async_query_and_get_table(Sqlite_Conn):
+    async def load():
+        return await asyncio.gather(
+            query_async("select count(*) as n from census", Sqlite_Conn),
+            get_table_async('census', Sqlite_Conn, schema='main'))
+    counts, table = asyncio.run(load())
+    assert counts.loc[0, 'n'] == table.shape[0] == 100
+
+def test_query_async_goes_through_query(Sqlite_Conn, Budget, monkeypatch):
+    sql = "select CensusTerm from census"
+    df = asyncio.run(query_async(sql, Sqlite_Conn, compact=True))
+    assert isinstance(df, DataFrame) and df['CensusTerm'].dtype == 'category'
+    # sqlite gives no estimate for a query, so stand in a large one
+    monkeypatch.setattr(db, '_estimate_query', lambda sql, conn, params: (10**6, 10**8))
+    Budget(max_bytes=10000, action='refuse')
+    with pytest.raises(RuntimeError):
+        asyncio.run(query_async(sql, Sqlite_Conn))
+
+@pytest.mark.parametrize("partition_by", ['PupilMatchingRefAnonymous', 'CensusTerm', 'NCYearActual'])
+def test_partitioned_get_table_matches_get_table(Sqlite_Conn, partition_by):
+    with get_engine(Sqlite_Conn).begin() as c:
+        c.exec_driver_sql("insert into census (forename) values ('NoKeys')")
+    whole = get_table('census', Sqlite_Conn, schema='main')
+    parts = get_table('census', Sqlite_Conn, schema='main', partition_by=partition_by, partitions=3, workers=2)
+    assert isinstance(parts, DataFrame)
+    assert parts.shape == (101, 5)
+    assert parts[partition_by].equals(
+        whole.sort_values(partition_by, kind='stable')[partition_by].reset_index(drop=True))
+    assert sorted(parts['forename']) == sorted(whole['forename'])
+
+def test_get_table_with_columns_where_and_limit(Sqlite_Conn):
+    df = get_table('census', Sqlite_Conn, schema='main', columns=['PupilMatchingRefAnonymous', 'NCYearActual'],
+        where={'CensusTerm': 'Autumn', 'NCYearActual': ['R', '1']})
+    assert df.columns.tolist() == ['PupilMatchingRefAnonymous', 'NCYearActual']
+    assert set(df['NCYearActual']) == {'R', '1'}
+    assert df.shape[0] == 15
+    assert get_table('census', Sqlite_Conn, schema='main', where=[('PupilMatchingRefAnonymous', '>', 90)],
+        limit=5).shape == (5, 5)
+
+def test_get_table_rejects_unknown_columns(Sqlite_Conn):
+    with pytest.raises(KeyError):
+        get_table('census', Sqlite_Conn, schema='main', columns=['UPN'])
+    with pytest.raises(KeyError):
+        get_table('census', Sqlite_Conn, schema='main', where={'UPN': 'A123456789012'})
+
+def test_partitioned_get_table_with_where(Sqlite_Conn):
+    df = get_table('census', Sqlite_Conn, schema='main', where={'CensusTerm': 'Spring'},
+        partition_by='PupilMatchingRefAnonymous', partitions=4)
+    assert df['PupilMatchingRefAnonymous'].tolist() == list(range(2, 101, 2))
+
+def test_table_meta_only_fetches_facets_used(Sqlite_Conn):
+    statements = []
+    event.listen(get_engine(Sqlite_Conn), 'before_cursor_execute', lambda *args: statements.append(args[2]))
+    meta = table_meta('main.census', Sqlite_Conn)
+    n_checked = len(statements)
+    assert [c['name'] for c in meta.columns][:2] == ['PupilMatchingRefAnonymous', 'AcademicYear']
+    n_columns = len(statements) - n_checked
+    assert meta.columns is meta.columns
+    assert len(statements) - n_checked == n_columns
+    d = meta.as_dict()
+    assert len(statements) - n_checked > n_columns
+    assert set(d) == {'schema', 'tablename', 'columns', 'constraints', 'foreign_keys', 'indexes',
+        'pk_constr', 'uniq_constr', 'table_comment'}
+
+def test_reflect_schema_saves_snapshot(Sqlite_Conn, Cache):
+    with get_engine(Sqlite_Conn).begin() as c:
+        c.exec_driver_sql("create view autumn as select forename from census where CensusTerm = 'Autumn'")
+    df = reflect_schema(Sqlite_Conn)
+    assert df[['tablename', 'table_type']].drop_duplicates().values.tolist() == [['autumn', 'view'],
+        ['census', 'table']]
+    assert df.loc[df['tablename'] == 'census', 'column'].tolist()[:2] == ['PupilMatchingRefAnonymous', 'AcademicYear']
+    with get_engine(Sqlite_Conn).begin() as c:
+        c.exec_driver_sql("create table extra (x integer)")
+    assert reflect_schema(Sqlite_Conn).equals(df)
+    invalidate_metadata(Sqlite_Conn)
+    assert 'extra' in set(reflect_schema(Sqlite_Conn)['tablename'])
+
+def test_query_with_arrow_backend(Sqlite_Conn):
+    df = query("select * from census", Sqlite_Conn, arrow=True)
+    assert isinstance(df, DataFrame)
+    assert all(isinstance(t, pd.ArrowDtype) for t in df.dtypes)
+    assert df['forename'].tolist() == query("select * from census", Sqlite_Conn)['forename'].tolist()
+
+def test_get_table_with_arrow_backend(Sqlite_Conn):
+    df = get_table('census', Sqlite_Conn, schema='main', where={'CensusTerm': 'Autumn'}, arrow=True)
+    assert df.shape == (50, 5)
+    assert str(df['PupilMatchingRefAnonymous'].dtype) == 'int64[pyarrow]'
+    parts = get_table('census', Sqlite_Conn, schema='main', partition_by='CensusTerm', arrow=True)
+    assert str(parts['CensusTerm'].dtype) == 'string[pyarrow]'
+
+def test_get_table_compact_uses_column_types(Sqlite_Conn):
+    df = get_table('census', Sqlite_Conn, schema='main', compact=True)
+    assert str(df['AcademicYear'].dtype) == 'Int32'
+    assert str(df['CensusTerm'].dtype) == 'category'
+    assert df.attrs['compact']['bytes_saved'] > 0
+    assert str(query("select NCYearActual from census", Sqlite_Conn, compact=10)['NCYearActual'].dtype) == 'category'
+
+def test_get_table_compact_then_summarise(Sqlite_Conn):
+    df = get_table('census', Sqlite_Conn, schema='main', compact=True)
+    report = df.minmax().set_index('name')
+    assert report.loc['CensusTerm', ['type', 'min', 'max']].tolist() == ['category', 'Autumn', 'Spring']
+    assert report.loc['forename', 'min'] == 'Name0'
+    assert fd(df, ['CensusTerm'])['CensusTerm'].tolist() == [50, 50]
+
+@pytest.fixture
+def Env_File(tmp_path, monkeypatch):
+    path = tmp_path / ".env"
+    path.write_text("DFEQA_TEST_CONN = sqlite:///first.db\n")
+    reads = []
+    def counting_dotenv_values(p):
+        reads.append(p)
+        return dotenv_values(p)
+    monkeypatch.setattr(db, 'find_dotenv', lambda: str(path))
+    monkeypatch.setattr(db, 'dotenv_values', counting_dotenv_values)
+    db.reload_env()
+    yield path, reads
+    configure_env(watch=False)
+    path.unlink()
+    db.reload_env()
+    db._env_state['loaded'] = False
+
+def test_env_is_read_once(Env_File):
+    path, reads = Env_File
+    for _x in range(5):
+        assert db._resolve_conn('DFEQA_TEST_CONN') == 'sqlite:///first.db'
+    assert len(reads) == 1
+    path.write_text("DFEQA_TEST_CONN = sqlite:///second.db\n")
+    assert db._resolve_conn('DFEQA_TEST_CONN') == 'sqlite:///first.db'
+    db.reload_env()
+    assert db._resolve_conn('DFEQA_TEST_CONN') == 'sqlite:///second.db'
+
+def test_env_is_watched(Env_File):
+    path, reads = Env_File
+    configure_env(watch=True)
+    db._resolve_conn('DFEQA_TEST_CONN')
+    assert len(reads) == 1
+    path.write_text("DFEQA_TEST_CONN = sqlite:///second.db\n")
+    os.utime(path, (0, 0))
+    assert db._resolve_conn('DFEQA_TEST_CONN') == 'sqlite:///second.db'
+    assert len(reads) == 2
+
+def test_minmax_sql_matches_minmax(Sqlite_Conn):
+    census = get_table('census', Sqlite_Conn, schema='main')
+    profile = minmax_sql('census', Sqlite_Conn, schema='main', columns=['CensusTerm', 'forename'])
+    expected = census[['CensusTerm', 'forename']].minmax()
+    expected['elements'] = expected['elements'].map(sorted)
+    assert profile.to_dict('records') == expected[profile.columns].to_dict('records')
+
+def test_minmax_sql_numeric_with_top_values(Sqlite_Conn):
+    report = minmax_sql('census', Sqlite_Conn, schema='main', top_n=2,
+        where={'AcademicYear': 202324}).iloc[1]
+    assert report['name'] == 'AcademicYear'
+    assert (report['type'], report['min'], report['max'], report['n_unique']) == ('numeric', 202324, 202324, 1)
+    assert report['elements'] == ['(1 unique values)', 202324]
+
+def test_get_table_sample(Sqlite_Conn):
+    df = get_table('census', Sqlite_Conn, schema='main', sample=0.3, sample_key='PupilMatchingRefAnonymous')
+    keys = df['PupilMatchingRefAnonymous'].tolist()
+    # the same rows every time, spread through the ids rather than a block of them
+    assert keys == get_table('census', Sqlite_Conn, schema='main', sample=0.3,
+        sample_key='PupilMatchingRefAnonymous')['PupilMatchingRefAnonymous'].tolist()
+    assert len(keys) == 30 and keys[:4] == [2, 5, 10, 13] and keys[-1] == 99
+    assert df.attrs['sample'] == {'fraction': 0.3, 'method': 'modulo'}
+    est, lower, upper = df['CensusTerm'].minmax()['estimates']['n_rows']
+    assert est == 100 and 30 <= lower < est < upper
+    df = get_table('census', Sqlite_Conn, schema='main', columns=['CensusTerm'], sample=0.5)
+    assert len(df) < 100 and df.attrs['sample']['method'] == 'random'
+    with pytest.raises(RuntimeError):
+        get_table('census', Sqlite_Conn, schema='main', sample=2)
+
+def test_get_table_incremental(Sqlite_Conn, tmp_path):
+    with get_engine(Sqlite_Conn).begin() as connection:
+        connection.exec_driver_sql("create table pupils (id integer primary key, name text, modified integer)")
+        connection.exec_driver_sql("insert into pupils values (1, 'a', 1), (2, 'b', 2), (3, 'c', 3)")
+    df = get_table_incremental('pupils', Sqlite_Conn, schema='main', watermark='modified', directory=tmp_path)
+    assert df.attrs['incremental'] == {'rows_fetched': 3, 'rows': 3, 'watermark': 3}
+    with get_engine(Sqlite_Conn).begin() as connection:
+        connection.exec_driver_sql("update pupils set name = 'B', modified = 4 where id = 2")
+        connection.exec_driver_sql("insert into pupils values (4, 'd', 5)")
+    df = get_table_incremental('pupils', Sqlite_Conn, schema='main', watermark='modified', directory=tmp_path)
+    assert df.attrs['incremental'] == {'rows_fetched': 2, 'rows': 4, 'watermark': 5}
+    assert df.sort_values('id')['name'].tolist() == ['a', 'B', 'c', 'd']
+    df = get_table_incremental('pupils', Sqlite_Conn, schema='main', watermark='modified', directory=tmp_path)
+    assert df.attrs['incremental']['rows_fetched'] == 0 and len(df) == 4
+    assert (tmp_path / 'state.json').exists()
+
+def test_get_table_incremental_state_has_no_password(Sqlite_Conn, tmp_path, monkeypatch):
+    conn_id = db._conn_id
+    # stand in for a server url with a password, which sqlite urls can't carry
+    monkeypatch.setattr(db, '_conn_id', lambda conn: conn_id(conn) + '?user=u&password=s3cret')
+    get_table_incremental('census', Sqlite_Conn, schema='main', watermark='PupilMatchingRefAnonymous',
+        directory=tmp_path / 'incremental')
+    state = (tmp_path / 'incremental' / 'state.json').read_text()
+    assert 's3cret' not in state
+
+def test_query_with_params(Sqlite_Conn):
+    sql = "select * from census where AcademicYear = :year and NCYearActual in :ncyears"
+    df = query(sql, Sqlite_Conn, params={'year': 202324, 'ncyears': ('R', '1')})
+    assert len(df) == 15 and set(df['NCYearActual']) == {'R', '1'}
+    assert [len(x) for x in query_many("select * from census where AcademicYear = :year", Sqlite_Conn,
+        params=[{'year': 202324}, {'year': 202425}, {'year': 0}])] == [50, 50, 0]
+    chunks = list(query_iter(sql, Sqlite_Conn, chunksize=10, params={'year': 202425, 'ncyears': ['R']}))
+    assert sum(len(x) for x in chunks) == len(query(sql, Sqlite_Conn, params={'year': 202425, 'ncyears': {'R'}}))
+
+def test_query_stats(Sqlite_Conn, Cache, tmp_path):
+    options = dict(db.stats_options)
+    configure_stats(log=tmp_path / "queries.jsonl")
+    stats(clear=True)
+    try:
+        for term in ['Autumn', 'Spring', 'Spring']:
+            query("select * from census where CensusTerm = '%s'" % term, Sqlite_Conn, cache=True)
+        get_table('census', Sqlite_Conn, schema='main', columns=['forename'], limit=5)
+        df = stats(clear=True)
+    finally:
+        db.stats_options.update(options)
+    assert df['cache'].tolist() == ['miss', 'miss', 'hit', 'off']
+    assert df['rows'].tolist() == [50, 50, 50, 5] and (df['bytes'] > 0).all()
+    assert df['fingerprint'].nunique() == 2 and df['connection'].str.startswith('sqlite:///').all()
+    assert df['first_row_seconds'].isna().tolist() == [False, False, True, False]
+    assert (df['fetch_seconds'] >= df['first_row_seconds'].fillna(0)).all() and stats().empty
+    assert len((tmp_path / "queries.jsonl").read_text().splitlines()) == 4
+    with pytest.raises(KeyError):
+        configure_stats(logging=True)
+
+def test_query_stats_bytes_from_sample():
+    df = pd.DataFrame({'name': ['Name%d' % (x % 977) for x in range(20000)], 'n': range(20000)})
+    assert abs(db._approx_bytes(df) / df.memory_usage(index=True, deep=True).sum() - 1) < 0.05
+
+@pytest.fixture
+def Budget():
+    options = dict(db.budget_options)
+    yield configure_budget
+    db.budget_options.update(options)
+
+def test_get_table_budget(Sqlite_Conn, Budget, caplog):
+    Budget(max_bytes=10000, action='refuse')
+    assert len(get_table('census', Sqlite_Conn, schema='main', columns=['AcademicYear'])) == 100
+    with pytest.raises(RuntimeError):
+        get_table('census', Sqlite_Conn, schema='main')
+    assert "over the budget" in caplog.text
+    Budget(action='stream')
+    chunks = list(get_table('census', Sqlite_Conn, schema='main', where={'CensusTerm': 'Autumn'}))
+    assert len(chunks) > 1 and sum(len(x) for x in chunks) == 50
+    Budget(action='sample')
+    df = get_table('census', Sqlite_Conn, schema='main')
+    assert 0 < df.attrs['sample']['fraction'] < 1 and len(df) < 100
+    # sqlite gives no estimate for a query, so it is fetched as normal
+    assert len(query("select * from census", Sqlite_Conn)) == 100
+    with pytest.raises(KeyError):
+        Budget(action='crash')
+
+def test_get_table_budget_allows_for_where(Sqlite_Conn, Budget):
+    # the whole table is estimated at about 26000 bytes and one year of it at half that
+    Budget(max_bytes=15000, action='sample')
+    df = get_table('census', Sqlite_Conn, schema='main', where={'AcademicYear': 202324})
+    assert len(df) == 50 and 'sample' not in df.attrs
+    assert 'sample' in get_table('census', Sqlite_Conn, schema='main').attrs
+
+@pytest.mark.parametrize("action", ['sample', 'stream'])
+def test_get_table_incremental_ignores_budget(Sqlite_Conn, Budget, tmp_path, action):
+    with get_engine(Sqlite_Conn).begin() as connection:
+        connection.exec_driver_sql("create table pupils (id integer primary key, name text)")
+        connection.exec_driver_sql("insert into pupils values " + ", ".join("(%d, 'n')" % i for i in range(200)))
+    get_table_incremental('pupils', Sqlite_Conn, schema='main', watermark='id', directory=tmp_path)
+    with get_engine(Sqlite_Conn).begin() as connection:
+        connection.exec_driver_sql("insert into pupils values " + ", ".join("(%d, 'n')" % i for i in range(200, 400)))
+    # every new row is merged into the copy, not a sample or stream of them
+    Budget(max_bytes=2000, action=action)
+    df = get_table_incremental('pupils', Sqlite_Conn, schema='main', watermark='id', directory=tmp_path)
+    assert df.attrs['incremental'] == {'rows_fetched': 200, 'rows': 400, 'watermark': 399}
+    assert sorted(df['id']) == list(range(400))
+
+def test_write_table(Sqlite_Conn):
+    census = get_table('census', Sqlite_Conn, schema='main')
+    report = write_table(census, 'census_copy', Sqlite_Conn, schema='main', chunksize=30)
+    assert report['rows'] == 100 and report['rows_per_second'] > 0
+    assert get_table('census_copy', Sqlite_Conn, schema='main').equals(census)
+    with pytest.raises(RuntimeError):
+        write_table(census, 'census_copy', Sqlite_Conn, schema='main')
+    write_table(census.head(10), 'census_copy', Sqlite_Conn, schema='main', if_exists='append')
+    assert len(get_table('census_copy', Sqlite_Conn, schema='main')) == 110
+    write_table(census.head(10), 'census_copy', Sqlite_Conn, schema='main', if_exists='replace')
+    assert get_table('census_copy', Sqlite_Conn, schema='main').equals(census.head(10))
+    assert sorted(x[1] for x in list_tables(Sqlite_Conn)) == ['census', 'census_copy']
+
+def test_list_tables_skips_postgres_system_schemas(monkeypatch):
+    statements = []
+    class Connection:
+        def __enter__(self):
+            return self
+        def __exit__(self, *args):
+            return False
+        def execute(self, sql, params):
+            statements.append(str(sql))
+            return []
+    monkeypatch.setattr(db, 'connect', lambda eng: Connection())
+    eng = create_mock_engine('postgresql://', lambda *args, **kwargs: None)
+    list_tables(eng)
+    list_tables(eng, schema='pg_catalog')
+    assert "not like 'pg\\_%'" in statements[0] and "'information_schema'" in statements[0]
+    assert 'pg_' not in statements[1]
+
+def test_match_keys(Sqlite_Conn):
+    keys = pd.Series([5, 10, 10, 150, 200, None], name='PupilMatchingRefAnonymous')
+    matched = match_keys(keys, 'census', Sqlite_Conn, schema='main', columns=['PupilMatchingRefAnonymous', 'forename'])
+    assert sorted(matched['PupilMatchingRefAnonymous']) == [5, 10] and list(matched.columns)[1] == 'forename'
+    unmatched = match_keys(keys.rename('pmr'), 'census', Sqlite_Conn, schema='main',
+        on='PupilMatchingRefAnonymous', how='unmatched')
+    assert sorted(unmatched['pmr']) == [150, 200]
+    unnamed = match_keys(pd.Series([5, 150]), 'census', Sqlite_Conn, schema='main', on='PupilMatchingRefAnonymous',
+        how='unmatched')
+    assert unnamed['PupilMatchingRefAnonymous'].tolist() == [150]
+    pairs = pd.DataFrame({'year': [202324, 202324], 'term': ['Autumn', 'Summer']})
+    assert len(match_keys(pairs, 'census', Sqlite_Conn, schema='main', on=['AcademicYear', 'CensusTerm'],
+        where={'NCYearActual': 'R'})) == 4
+    assert match_keys(pairs, 'census', Sqlite_Conn, schema='main', on=['AcademicYear', 'CensusTerm'],
+        how='unmatched')['term'].tolist() == ['Summer']
+
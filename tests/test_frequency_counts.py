@@ -1,6 +1,6 @@
 import pandas as pd
 
-from dfeqa import fd, summary
+from dfeqa import fd, fd_sql, get_table, summary
 from dfeqa.datastructures import DataFrame
 
 
@@ -234,3 +234,24 @@ def test_object_wide_default_sort(List_Of_Series, Wide_Frame_Length_Summary):
     pd.testing.assert_frame_equal(summary([x.str.len() for x in List_Of_Series], dropna=False)\
         .wide_fd(),
         DataFrame(benchmark))
+
+def test_fd_sql_matches_fd(Sqlite_Conn):
+    census = get_table('census', Sqlite_Conn, schema='main')
+    assert fd_sql('main.census', ['CensusTerm', 'NCYearActual'], Sqlite_Conn).equals(
+        fd(census, ['CensusTerm', 'NCYearActual']))
+    assert fd_sql('select * from census', 'forename', Sqlite_Conn, long=True, value_columnname='name').equals(
+        fd(census, ['forename'], long=True, value_columnname='name'))
+
+def test_fd_sql_split_by_group(Sqlite_Conn):
+    census = get_table('census', Sqlite_Conn, schema='main')
+    assert fd_sql('census', 'NCYearActual', Sqlite_Conn, by='AcademicYear', schema='main',
+        where={'CensusTerm': 'Autumn'}).equals(
+        fd([census.loc[(census['AcademicYear'] == y) & (census['CensusTerm'] == 'Autumn'), 'NCYearActual']
+            for y in [202324, 202425]], ids=['202324', '202425']))
+
+def test_fd_estimates_from_sample(List_Of_Series):
+    wide = fd(List_Of_Series[0], sample_fraction=0.1)
+    assert (wide['count_est'] == wide['count'] * 10).all()
+    assert (wide['count_lower'] >= wide['count']).all() and (wide['count_upper'] > wide['count_est']).all()
+    long = fd(List_Of_Series[0].to_frame(), long=True, sample_fraction=1)
+    assert long['estimate'].equals(long['count']) and long['upper'].equals(long['count'])
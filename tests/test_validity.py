@@ -1,6 +1,6 @@
 import re
 
-from dfeqa import valid_name_regex, valid_upn
+from dfeqa import char_counts, char_inventory, unicode_blocks, valid_name_regex, valid_upn
 
 
 def test_valid_name():
@@ -20,3 +20,15 @@ def test_valid_upn():
 
 def test_invalid_upn():
     assert not valid_upn('B123456789012')
+
+def test_char_inventory():
+    assert char_inventory(['Zoë', None, 'Anna', 'Жанна']) == 'ZoëAnaЖан'
+    assert char_inventory([]) == ''
+
+def test_char_counts_weighted():
+    counts = char_counts(['ab', None, 'b'], weights=[2, 5, 3])
+    assert counts.to_dict() == {'a': 2, 'b': 5}
+
+def test_unicode_blocks():
+    blocks = unicode_blocks(['Zoë', 'Жанна'])
+    assert blocks.to_dict() == {'Cyrillic': 5, 'Basic Latin': 2, 'Latin-1 Supplement': 1}